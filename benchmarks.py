@@ -0,0 +1,210 @@
+"""Benchmarks of the training, inference and metrics hot paths.
+
+Times loading, fitting and classifying on the csv files in data/ and on
+synthetic datasets of any size, and prints the results as JSON:
+
+    python benchmarks.py
+    python benchmarks.py --sizes 10000 100000 --repeats 7 --output bench.json
+    python benchmarks.py --filter forest
+
+Every case runs its warmup rounds, then is timed over repeated rounds
+with time.perf_counter; one further traced round reports the peak memory
+allocated through Python and numpy (tracemalloc).
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import time
+import tracemalloc
+
+import numpy as np
+
+import submission as dt
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+CSV_FILES = {
+    'part23_data': 'part23_data.csv',
+    'mod_complex_binary': 'mod_complex_binary.csv',
+    'vectorize': 'vectorize.csv',
+}
+
+SPARSE_CSV_FILE = 'challenge_train.csv'
+
+
+def synthetic_dataset(num_rows, num_features=20, num_classes=2, seed=0):
+    """Generate a classification dataset of a given size.
+    Classes come from thresholds on a few random projections of the
+    features, with a tenth of the labels flipped as noise.
+    Args:
+        num_rows (int): number of examples.
+        num_features (int): number of features.
+        num_classes (int): number of classes.
+        seed (int): seed of the generator.
+    Returns:
+        Tuple (features (m x n), classes (m x 1)).
+    """
+
+    rng = np.random.default_rng(seed)
+    features = rng.normal(size=(num_rows, num_features))
+    projections = features[:, :5] @ rng.normal(size=(5, num_classes - 1))
+    classes = np.zeros(num_rows, dtype=int)
+    for i in range(num_classes - 1):
+        classes += projections[:, i] > 0
+    noise = rng.random(num_rows) < 0.1
+    classes[noise] = rng.integers(num_classes, size=int(noise.sum()))
+    return features, classes
+
+
+def measure(func, warmup=1, repeats=5):
+    """Time a benchmark case and measure its peak memory.
+    Args:
+        func (func): the case, called without arguments.
+        warmup (int): untimed calls first.
+        repeats (int): timed calls.
+    Returns:
+        dict of timing statistics in seconds and peak traced bytes.
+    """
+
+    for _ in range(warmup):
+        func()
+
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {'min': min(times), 'median': statistics.median(times),
+            'mean': statistics.mean(times),
+            'stdev': statistics.stdev(times) if len(times) > 1 else 0.0,
+            'repeats': repeats, 'peak_bytes': peak}
+
+
+def datasets(sizes):
+    """List the labelled datasets to train on.
+    Args:
+        sizes (list(int)): row counts of synthetic datasets.
+    Yields:
+        Tuple (name, features, classes).
+    """
+
+    for name in ('part23_data', 'mod_complex_binary'):
+        path = os.path.join(DATA_DIR, CSV_FILES[name])
+        if os.path.exists(path):
+            features, classes = dt.load_csv(path, -1)
+            yield name, features, classes.astype(int)
+    for size in sizes:
+        features, classes = synthetic_dataset(size)
+        yield 'synthetic_{}'.format(size), features, classes
+
+
+def cases(sizes, name_filter=None):
+    """List every benchmark case.
+    Models are only fitted for classify cases that will run.
+    Args:
+        sizes (list(int)): row counts of synthetic datasets.
+        name_filter (str): when set, only list cases whose name contains it.
+    Yields:
+        Tuple (name, dataset, rows, func).
+    """
+
+    def wanted(*names):
+        return any(not name_filter or name_filter in name for name in names)
+
+    for name, file_name in sorted(CSV_FILES.items()):
+        path = os.path.join(DATA_DIR, file_name)
+        if os.path.exists(path):
+            rows = dt.count_lines(path)
+            yield 'load_csv', name, rows, lambda path=path: dt.load_csv(path, -1)
+
+    path = os.path.join(DATA_DIR, SPARSE_CSV_FILE)
+    if os.path.exists(path):
+        yield ('load_sparse_csv', 'challenge_train', dt.count_lines(path),
+               lambda: dt.load_sparse_csv(path, 0))
+
+    for name, features, classes in datasets(sizes):
+        rows = len(classes)
+        for engine, max_bins in (('exact', None), ('histogram', 64)):
+            tree = dt.DecisionTree(8, max_bins)
+            yield ('tree_fit_' + engine, name, rows,
+                   lambda tree=tree, f=features, c=classes: tree.fit(f, c))
+            if not wanted('tree_classify_' + engine):
+                continue
+            tree.fit(features, classes)
+            yield ('tree_classify_' + engine, name, rows,
+                   lambda tree=tree, f=features: tree.classify(f))
+
+        forest = dt.RandomForest(20, 6, .5, .5, max_bins=64, random_state=0)
+        yield ('forest_fit', name, rows,
+               lambda forest=forest, f=features, c=classes: forest.fit(f, c))
+        if not wanted('forest_classify', 'classification_metrics',
+                      'confusion_matrix'):
+            continue
+        forest.fit(features, classes)
+        yield ('forest_classify', name, rows,
+               lambda forest=forest, f=features: forest.classify(f))
+
+        output = np.asarray(forest.classify(features)).ravel()
+        yield ('classification_metrics', name, rows,
+               lambda o=output, c=classes: dt.classification_metrics(o, c))
+        yield ('confusion_matrix', name, rows,
+               lambda o=output, c=classes: dt.confusion_matrix(o, c))
+
+
+def run(sizes, warmup=1, repeats=5, name_filter=None):
+    """Run the benchmark cases.
+    Args:
+        sizes (list(int)): row counts of synthetic datasets.
+        warmup (int): untimed calls of each case.
+        repeats (int): timed calls of each case.
+        name_filter (str): when set, only run cases whose name contains it.
+    Returns:
+        dict with the machine description and one result per case.
+    """
+
+    results = []
+    for name, dataset, rows, func in cases(sizes, name_filter):
+        if name_filter and name_filter not in name:
+            continue
+        result = {'name': name, 'dataset': dataset, 'rows': rows}
+        result.update(measure(func, warmup, repeats))
+        results.append(result)
+
+    machine = {'python': platform.python_version(), 'numpy': np.__version__,
+               'platform': platform.platform(), 'cpu_count': os.cpu_count()}
+    return {'machine': machine, 'results': results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='*', default=[10000, 100000],
+                        help='rows of the synthetic datasets')
+    parser.add_argument('--warmup', type=int, default=1,
+                        help='untimed calls of each case')
+    parser.add_argument('--repeats', type=int, default=5,
+                        help='timed calls of each case')
+    parser.add_argument('--filter', dest='name_filter',
+                        help='only run cases whose name contains this')
+    parser.add_argument('--output', help='also write the JSON to this file')
+    args = parser.parse_args()
+
+    report = json.dumps(run(args.sizes, args.warmup, args.repeats,
+                            args.name_filter), indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, 'w') as handle:
+            handle.write(report + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,12 @@
+import importlib.util
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 import submission as dt
 import numpy as np
+import os
+import tempfile
 import time
+import tracemalloc
 
 
 def curr_time_millis():
@@ -303,6 +308,1422 @@ class DecisionTreePart3Tests(unittest.TestCase):
    
         assert result > .75
 
+class CsvLoadingTests(unittest.TestCase):
+    """Tests for block-wise csv loading."""
+
+    def test_load_csv_dtypes(self):
+        """Test loading with chosen dtypes.
+
+        Asserts:
+            features and classes have the requested dtypes and values.
+        """
+
+        features, classes = dt.load_csv('./data/part23_data.csv',
+                                        dtype=np.float32, class_dtype=np.int8)
+        full_features, full_classes = dt.load_csv('./data/part23_data.csv')
+
+        assert features.dtype == np.float32
+        assert classes.dtype == np.int8
+        assert np.array_equal(classes, full_classes)
+        assert np.allclose(features, full_features)
+
+    def test_iter_csv_blocks(self):
+        """Test streaming the csv in row blocks.
+
+        Asserts:
+            blocks have the block size and join up to the whole file.
+        """
+
+        blocks = list(dt.iter_csv('./data/vectorize.csv', 1, block_rows=500))
+        data = dt.load_csv('./data/vectorize.csv', 1, block_rows=64)
+
+        assert [len(block) for block in blocks[:-1]] == [500] * (len(blocks) - 1)
+        assert np.array_equal(np.vstack(blocks), data)
+        assert dt.count_lines('./data/vectorize.csv') == len(data)
+
+
+class BinaryDatasetTests(unittest.TestCase):
+    """Tests for the memory-mapped binary dataset format."""
+
+    def setUp(self):
+        """Set up test data.
+        """
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'data.bin')
+        self.features, self.classes = dt.load_csv(
+            './data/mod_complex_binary.csv')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_csv_to_dataset_round_trip(self):
+        """Test converting a csv file and mapping it back.
+
+        Asserts:
+            the mapped arrays are column-major and equal the csv data.
+        """
+
+        written = dt.csv_to_dataset('./data/mod_complex_binary.csv',
+                                    self.path, block_rows=300)
+        features, classes = dt.load_dataset(self.path)
+
+        assert written == len(self.classes)
+        assert isinstance(features, np.memmap)
+        assert features.flags.f_contiguous
+        assert np.array_equal(features, self.features)
+        assert np.array_equal(classes, self.classes)
+
+    def test_csv_to_dataset_blank_lines(self):
+        """Test converting a csv file with blank lines.
+
+        Asserts:
+            only the rows are written, into arrays sized for them.
+        """
+
+        csv_path = os.path.join(self.directory.name, 'blank.csv')
+        with open(csv_path, 'w') as handle:
+            handle.write('1,2,0\n\n3,4,1\n  \n5,6,0\n\n')
+
+        written = dt.csv_to_dataset(csv_path, self.path, block_rows=2)
+        features, classes = dt.load_dataset(self.path)
+
+        assert written == 3
+        assert np.array_equal(features, [[1, 2], [3, 4], [5, 6]])
+        assert np.array_equal(classes, [0, 1, 0])
+
+    def test_csv_to_dataset_no_rows(self):
+        """Test converting a csv file without rows.
+
+        Asserts:
+            empty and all-blank files raise ValueError, like load_csv().
+        """
+
+        csv_path = os.path.join(self.directory.name, 'empty.csv')
+        for text in ('', '\n  \n\n'):
+            with open(csv_path, 'w') as handle:
+                handle.write(text)
+            with self.assertRaises(ValueError):
+                dt.csv_to_dataset(csv_path, self.path)
+
+    def test_fit_on_mapped_dataset(self):
+        """Test training and classifying straight from the mapped file.
+
+        Asserts:
+            results equal training on the in-memory arrays.
+        """
+
+        dt.save_dataset(self.path, self.features.astype(np.float32),
+                        self.classes.astype(np.int8))
+        features, classes = dt.load_dataset(self.path)
+        mapped_tree = dt.DecisionTree(depth_limit=4)
+        mapped_tree.fit(features, classes)
+        tree = dt.DecisionTree(depth_limit=4)
+        tree.fit(np.array(features), np.array(classes))
+
+        assert features.dtype == np.float32 and classes.dtype == np.int8
+        assert np.array_equal(mapped_tree.classify(features),
+                              tree.classify(features))
+
+
+class OutOfCoreTrainingTests(unittest.TestCase):
+    """Tests for training from streamed row blocks."""
+
+    def setUp(self):
+        """Set up test data.
+        """
+        self.path = './data/mod_complex_binary.csv'
+        self.features, self.classes = dt.load_csv(self.path)
+
+    def test_streamed_tree_matches_in_memory(self):
+        """Test a tree grown from csv blocks against an in-memory fit.
+
+        Asserts:
+            both trees have the same splits and classify alike.
+        """
+
+        streamed = dt.DecisionTree(depth_limit=5, max_bins=256)
+        streamed.fit_blocks(lambda: dt.iter_csv(self.path, block_rows=250))
+        tree = dt.DecisionTree(depth_limit=5, max_bins=256)
+        tree.fit(self.features, self.classes)
+
+        assert np.array_equal(np.sort(streamed.flat.threshold),
+                              np.sort(tree.flat.threshold))
+        assert np.array_equal(streamed.classify(self.features),
+                              tree.classify(self.features))
+
+    def test_streamed_random_forest(self):
+        """Test a forest grown from csv blocks.
+
+        Asserts:
+            seeded forests repeat and accuracy is greater than 90%.
+        """
+
+        votes = []
+        for _ in range(2):
+            forest = dt.RandomForest(10, 4, .5, .5, max_bins=32,
+                                     random_state=5)
+            forest.fit_blocks(lambda: dt.iter_csv(self.path, block_rows=400))
+            votes.append(forest.vote_counts(self.features))
+
+        assert np.array_equal(votes[0], votes[1])
+        assert dt.accuracy(forest.classify(self.features).ravel(),
+                           self.classes) > .90
+
+
+class ModelSerializationTests(unittest.TestCase):
+    """Tests for saving and loading fitted models."""
+
+    def setUp(self):
+        """Set up test data.
+        """
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'model.bin')
+        self.features, self.classes = dt.load_csv(
+            './data/mod_complex_binary.csv')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_decision_tree_round_trip(self):
+        """Test saving and loading a tree.
+
+        Asserts:
+            the loaded tree classifies like the saved one, also by decide.
+        """
+
+        tree = dt.DecisionTree(depth_limit=6)
+        tree.fit(self.features, self.classes)
+        tree.save(self.path)
+        loaded = dt.DecisionTree.load(self.path)
+
+        assert loaded.depth_limit == 6
+        assert np.array_equal(loaded.classify(self.features),
+                              tree.classify(self.features))
+        assert loaded.root.decide(self.features[3]) == tree.root.decide(self.features[3])
+
+    def test_random_forest_round_trip(self):
+        """Test saving and loading a forest.
+
+        Asserts:
+            the loaded forest keeps its attribute lists and votes.
+        """
+
+        forest = dt.RandomForest(12, 4, .4, .6, random_state=9)
+        forest.fit(self.features, self.classes)
+        forest.save(self.path)
+        loaded = dt.RandomForest.load(self.path)
+
+        assert loaded.num_trees == 12 and loaded.random_state == 9
+        for saved, read in zip(forest.feature_list, loaded.feature_list):
+            assert np.array_equal(saved, read)
+        assert np.array_equal(loaded.vote_counts(self.features),
+                              forest.vote_counts(self.features))
+        with self.assertRaises(ValueError):
+            dt.DecisionTree.load(self.path)
+
+
+class CodeGenerationTests(unittest.TestCase):
+    """Tests for exporting fitted models as Python source."""
+
+    def setUp(self):
+        """Set up test data.
+        """
+        self.directory = tempfile.TemporaryDirectory()
+        self.features, self.classes = dt.load_csv(
+            './data/mod_complex_binary.csv')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def import_generated(self, model):
+        """Export a model to a module file and import it."""
+
+        path = os.path.join(self.directory.name, 'generated_model.py')
+        dt.export_python(model, path)
+        spec = importlib.util.spec_from_file_location('generated_model', path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+
+    def test_export_decision_tree(self):
+        """Test generated code for a full depth tree.
+
+        Asserts:
+            row and batch functions classify like the tree.
+        """
+
+        tree = dt.DecisionTree()
+        tree.fit(self.features, self.classes)
+        module = self.import_generated(tree)
+        expected = tree.predict_batch(self.features)
+
+        assert np.array_equal(module.classify_batch(self.features), expected)
+        assert [module.classify_row(row) for row in self.features] == list(expected)
+
+    def test_export_random_forest(self):
+        """Test generated code for a forest.
+
+        Asserts:
+            row and batch functions give the forest's majority vote.
+        """
+
+        forest = dt.RandomForest(9, 4, .5, .5, random_state=4)
+        forest.fit(self.features, self.classes)
+        module = self.import_generated(forest)
+        expected = forest.classify(self.features).ravel()
+
+        assert np.array_equal(module.classify_batch(self.features), expected)
+        assert [module.classify_row(row) for row in self.features] == list(expected)
+
+
+class SparseInputTests(unittest.TestCase):
+    """Tests for sparse active-feature input."""
+
+    def setUp(self):
+        """Set up test data.
+        """
+        self.matrix, self.classes = dt.load_sparse_csv(
+            './data/challenge_train.csv')
+        self.dense = self.matrix.toarray()
+
+    def test_load_sparse_csv(self):
+        """Test reading active feature lists into a CSRMatrix.
+
+        Asserts:
+            the first row's listed features are the stored entries.
+        """
+
+        with open('./data/challenge_train.csv') as handle:
+            first = [int(value) for value in handle.readline().split(',')]
+
+        assert self.matrix.shape[0] == len(self.classes)
+        assert self.classes[0] == first[0]
+        assert np.array_equal(np.flatnonzero(self.dense[0]), first[1:])
+
+    def test_csr_rows_and_lookup(self):
+        """Test row selection and entry lookup.
+
+        Asserts:
+            both agree with the dense matrix.
+        """
+
+        rows = np.array([5, 0, 5, 42])
+        columns = np.array([3, 0, 60, 11])
+
+        assert np.array_equal(self.matrix[rows].toarray(), self.dense[rows])
+        assert np.array_equal(self.matrix[10:20].toarray(), self.dense[10:20])
+        assert np.array_equal(self.matrix.lookup(rows, columns),
+                              self.dense[rows, columns])
+
+    def test_sparse_tree_matches_dense(self):
+        """Test training and classifying on the sparse matrix.
+
+        Asserts:
+            the sparse tree classifies like a tree trained on dense data.
+        """
+
+        sparse_tree = dt.DecisionTree(depth_limit=5)
+        sparse_tree.fit(self.matrix, self.classes)
+        dense_tree = dt.DecisionTree(depth_limit=5)
+        dense_tree.fit(self.dense, self.classes)
+
+        assert np.array_equal(sparse_tree.classify(self.matrix),
+                              dense_tree.classify(self.dense))
+
+    def test_sparse_random_forest(self):
+        """Test a forest on the sparse matrix.
+
+        Asserts:
+            sparse and dense examples get the same votes.
+        """
+
+        forest = dt.RandomForest(10, 4, .5, .5, random_state=0)
+        forest.fit(self.matrix, self.classes)
+
+        assert np.array_equal(forest.vote_counts(self.matrix),
+                              forest.vote_counts(self.dense))
+        assert dt.accuracy(forest.classify(self.matrix).ravel(),
+                           self.classes) > .85
+
+
+class MetricsTests(unittest.TestCase):
+    """Tests for the one-pass classifier metrics."""
+
+    def test_binary_metrics_match_confusion_matrix(self):
+        """Test the one-pass metrics against the binary helpers.
+
+        Asserts:
+            counts, accuracy, precision and recall agree with the helpers.
+        """
+
+        rng = np.random.RandomState(0)
+        output = rng.randint(0, 2, size=200)
+        truth = rng.randint(0, 2, size=200)
+        metrics = dt.classification_metrics(output, truth)
+        confusion = dt.confusion_matrix(output, truth)
+
+        assert np.array_equal(metrics['confusion'][::-1, ::-1], confusion)
+        assert metrics['accuracy'] == dt.accuracy(output, truth)
+        assert metrics['precision'][1] == dt.precision(output, truth)
+        assert metrics['recall'][1] == dt.recall(output, truth)
+
+    def test_undefined_precision_and_recall(self):
+        """Test precision and recall without positives.
+
+        Asserts:
+            both are nan, as in metrics_from_confusion(), instead of
+            raising.
+        """
+
+        assert np.isnan(dt.precision([0, 0, 0], [1, 0, 1]))
+        assert np.isnan(dt.recall([1, 0, 1], [0, 0, 0]))
+
+    def test_multiclass_metrics(self):
+        """Test metrics over string labels.
+
+        Asserts:
+            per-label precision, recall, f1 and support are correct.
+        """
+
+        output = ['a', 'b', 'b', 'c', 'a', 'c']
+        truth = ['a', 'b', 'c', 'c', 'b', 'c']
+        metrics = dt.classification_metrics(output, truth)
+
+        assert list(metrics['labels']) == ['a', 'b', 'c']
+        assert list(metrics['support']) == [1, 2, 3]
+        assert np.allclose(metrics['precision'], [0.5, 0.5, 1.0])
+        assert np.allclose(metrics['recall'], [1.0, 0.5, 2.0 / 3])
+        assert np.isclose(metrics['f1'][2], 0.8)
+        assert metrics['accuracy'] == 4.0 / 6
+
+    def test_sparse_integer_labels(self):
+        """Test large and gapped non-negative integer labels.
+
+        Asserts:
+            only the labels seen get a row, with no nan padding.
+        """
+
+        metrics = dt.classification_metrics([200000], [200000])
+        assert np.array_equal(metrics['labels'], [200000])
+        assert metrics['accuracy'] == 1
+
+        metrics = dt.classification_metrics([3, 7], [7, 7])
+        assert np.array_equal(metrics['labels'], [3, 7])
+        assert np.array_equal(metrics['precision'], [0, 1])
+
+    def test_accumulator_matches_single_pass(self):
+        """Test accumulating chunks whose label range grows.
+
+        Asserts:
+            the accumulated confusion equals the one-pass confusion.
+        """
+
+        rng = np.random.RandomState(1)
+        output = rng.randint(0, 5, size=300)
+        truth = rng.randint(0, 5, size=300)
+        truth[:100] = np.minimum(truth[:100], 1)
+        output[:100] = np.minimum(output[:100], 1)
+        accumulator = dt.MetricsAccumulator()
+        for start in range(0, 300, 100):
+            accumulator.update(output[start:start + 100],
+                               truth[start:start + 100])
+
+        expected = dt.classification_metrics(output, truth)
+        assert np.array_equal(accumulator.result()['confusion'],
+                              expected['confusion'])
+        assert accumulator.result()['macro_f1'] == expected['macro_f1']
+
+    def test_accumulator_merges_label_sets(self):
+        """Test accumulating chunks with negative and string labels.
+
+        Asserts:
+            counts land under their own labels, as in one pass.
+        """
+
+        chunks = [([-1, 1, 1], [-1, 1, -1]), ([0, 0, -1], [0, 1, -1])]
+        accumulator = dt.MetricsAccumulator()
+        for output, truth in chunks:
+            accumulator.update(output, truth)
+        expected = dt.classification_metrics([-1, 1, 1, 0, 0, -1],
+                                             [-1, 1, -1, 0, 1, -1])
+        assert np.array_equal(accumulator.result()['labels'], [-1, 0, 1])
+        assert np.array_equal(accumulator.result()['confusion'],
+                              expected['confusion'])
+
+        accumulator = dt.MetricsAccumulator()
+        accumulator.update(['b', 'a'], ['b', 'b'])
+        accumulator.update(['c'], ['a'])
+        assert list(accumulator.result()['labels']) == ['a', 'b', 'c']
+        assert accumulator.result()['confusion'][0, 2] == 1
+
+
+class MulticlassTests(unittest.TestCase):
+    """Tests for trees and forests on more than two classes."""
+
+    def setUp(self):
+        """Set up three classes separated by thresholds on two features.
+        """
+        rng = np.random.RandomState(2)
+        self.features = rng.uniform(-1, 1, size=(600, 4))
+        self.classes = np.where(self.features[:, 0] > .3, 7,
+                                np.where(self.features[:, 2] > 0, 4, 2))
+
+    def test_multiclass_trees(self):
+        """Test exact and histogram trees on three classes.
+
+        Asserts:
+            both trees fit the training data with the original labels.
+        """
+
+        for max_bins in (None, 64):
+            tree = dt.DecisionTree(max_bins=max_bins)
+            tree.fit(self.features, self.classes)
+            output = np.array(tree.classify(self.features))
+
+            assert set(output) == {2, 4, 7}
+            assert dt.accuracy(output, self.classes) > .99
+
+    def test_multiclass_majority_leaves(self):
+        """Test depth-limited leaves take the most common class.
+
+        Asserts:
+            a stump predicts the majority class of each side.
+        """
+
+        assert dt.majority_class([2, 7, 7, 4, 2, 7]) == 7
+        assert dt.majority_class([1, 0, 1, 0]) == 0
+
+        tree = dt.DecisionTree(depth_limit=1)
+        tree.fit(self.features, self.classes)
+        output = np.array(tree.classify(self.features))
+        for leaf in np.unique(output):
+            reached = self.classes[output == leaf]
+            assert leaf == dt.majority_class(reached)
+
+    def test_multiclass_forest_vote(self):
+        """Test the forest majority vote over three classes.
+
+        Asserts:
+            votes count every tree once, classify takes the most voted
+            class, and the generated code agrees.
+        """
+
+        forest = dt.RandomForest(11, 5, .5, .75, random_state=1,
+                                 oob_score=True)
+        forest.fit(self.features, self.classes)
+        votes = forest.vote_counts(self.features)
+        output = forest.classify(self.features).ravel()
+
+        assert list(forest.class_values) == [2, 4, 7]
+        assert np.array_equal(votes.sum(axis=1), np.full(600, 11))
+        assert np.array_equal(output, forest.class_values[votes.argmax(axis=1)])
+        assert dt.accuracy(output, self.classes) > .9
+        assert forest.oob_confusion.shape == (3, 3)
+
+        namespace = {}
+        exec(dt.export_python(forest), namespace)
+        assert np.array_equal(namespace['classify_batch'](self.features), output)
+        assert namespace['classify_row'](self.features[0]) == output[0]
+
+    def test_multiclass_streamed_tree(self):
+        """Test a tree grown from blocks with three classes.
+
+        Asserts:
+            the streamed tree classifies like the histogram tree.
+        """
+
+        blocks = lambda: ((self.features[i:i + 150], self.classes[i:i + 150])
+                          for i in range(0, 600, 150))
+        streamed = dt.DecisionTree(depth_limit=4, max_bins=32)
+        streamed.fit_blocks(blocks)
+
+        assert dt.accuracy(streamed.classify(self.features), self.classes) > .95
+
+
+class CriterionTests(unittest.TestCase):
+    """Tests for the pluggable split criteria."""
+
+    def setUp(self):
+        """Set up test data.
+        """
+        rng = np.random.RandomState(4)
+        self.features = rng.uniform(-1, 1, size=(300, 3))
+        self.targets = (np.where(self.features[:, 0] > .25, 5.0, 1.0) +
+                        np.where(self.features[:, 2] > -.5, 2.0, 0.0))
+
+    def test_entropy_gains_match_class_vectors(self):
+        """Test the vectorized information gain on one candidate.
+
+        Asserts:
+            the gain equals parent entropy minus weighted child entropy.
+        """
+
+        def entropy(classes):
+            _, counts = np.unique(classes, return_counts=True)
+            p = counts / float(len(classes))
+            return -np.sum(p * np.log2(p))
+
+        parent = np.array([0, 1, 2, 2, 1, 0, 0, 2])
+        left, right = parent[:3], parent[3:]
+        left_counts = np.bincount(left, minlength=3)
+        gain = dt.split_entropy_gains(left_counts[None], np.bincount(parent))[0]
+        expected = entropy(parent) - (3 * entropy(left) + 5 * entropy(right)) / 8
+
+        assert round(gain, 9) == round(expected, 9)
+        assert dt.get_criterion('entropy').impurity([2, 2]) == 1.0
+
+    def test_entropy_trees(self):
+        """Test exact and histogram trees split on information gain.
+
+        Asserts:
+            both trees fit the separable training data.
+        """
+
+        classes = (self.targets > 4).astype(int)
+        for max_bins in (None, 64):
+            tree = dt.DecisionTree(max_bins=max_bins, criterion='entropy')
+            tree.fit(self.features, classes)
+
+            assert dt.accuracy(tree.classify(self.features), classes) == 1.0
+
+    def test_variance_regression_tree(self):
+        """Test a regression tree on a piecewise constant target.
+
+        Asserts:
+            the tree recovers the target with four mean leaves and
+            survives saving.
+        """
+
+        tree = dt.DecisionTree(criterion='variance')
+        tree.fit(self.features, self.targets)
+        output = np.array(tree.classify(self.features))
+
+        assert np.allclose(output, self.targets)
+        assert np.count_nonzero(tree.flat.feature < 0) == 4
+
+        handle, path = tempfile.mkstemp()
+        os.close(handle)
+        try:
+            tree.save(path)
+            loaded = dt.DecisionTree.load(path, memory_map=False)
+        finally:
+            os.remove(path)
+        assert loaded.criterion == 'variance'
+        assert np.allclose(loaded.classify(self.features), output)
+
+    def test_unknown_criterion(self):
+        """Test criterion names are checked.
+
+        Asserts:
+            unknown names and regression forests raise ValueError.
+        """
+
+        with self.assertRaises(ValueError):
+            dt.DecisionTree(criterion='mse').fit(self.features, self.targets)
+        with self.assertRaises(ValueError):
+            dt.RandomForest(5, 3, .5, .5, criterion='variance')
+
+
+class TrainingStatsTests(unittest.TestCase):
+    """Tests for the per-node training instrumentation."""
+
+    def setUp(self):
+        """Set up test data.
+        """
+        rng = np.random.RandomState(6)
+        self.features = rng.uniform(-1, 1, size=(400, 4))
+        self.classes = (self.features[:, 0] * self.features[:, 1] > 0).astype(int)
+
+    def test_tree_records_every_node(self):
+        """Test the records of a single tree.
+
+        Asserts:
+            one record per node, split records match internal nodes and
+            the root holds every sample with all thresholds evaluated.
+        """
+
+        stats = dt.TrainingStats()
+        tree = dt.DecisionTree(5, stats=stats)
+        tree.fit(self.features, self.classes)
+        arrays = stats.as_arrays()
+
+        assert len(stats.records) == len(tree.flat.feature)
+        assert np.count_nonzero(arrays['split']) == np.count_nonzero(
+            tree.flat.feature >= 0)
+        assert arrays['samples'][0] == 400
+        assert arrays['candidates'][0] == 4 * 399
+        assert arrays['depth'].max() <= 5
+        assert stats.summary()['by_depth'][0]['nodes'] == 1
+
+    def test_memory_tracing_stops(self):
+        """Test that tracing started for a fit ends with it.
+
+        Asserts:
+            allocations are measured, tracemalloc is off after fit(), and
+            tracing started by the caller is left on.
+        """
+
+        stats = dt.TrainingStats(trace_memory=True)
+        tree = dt.DecisionTree(4, stats=stats)
+        tree.fit(self.features, self.classes)
+        assert stats.summary()['bytes'] > 0
+        assert not tracemalloc.is_tracing()
+
+        tracemalloc.start()
+        try:
+            tree.fit(self.features, self.classes)
+            assert tracemalloc.is_tracing()
+        finally:
+            tracemalloc.stop()
+
+    def test_memory_tracing_without_reset_peak(self):
+        """Test memory tracing where tracemalloc has no reset_peak().
+
+        Asserts:
+            allocations are still measured on Python 3.8, which lacks
+            tracemalloc.reset_peak().
+        """
+
+        reset_peak = getattr(tracemalloc, 'reset_peak', None)
+        if reset_peak is not None:
+            del tracemalloc.reset_peak
+        try:
+            stats = dt.TrainingStats(trace_memory=True)
+            tree = dt.DecisionTree(4, stats=stats)
+            tree.fit(self.features, self.classes)
+            assert stats.summary()['bytes'] > 0
+            assert not tracemalloc.is_tracing()
+        finally:
+            if reset_peak is not None:
+                tracemalloc.reset_peak = reset_peak
+
+    def test_forest_merges_tree_records(self):
+        """Test records aggregated across a parallel forest.
+
+        Asserts:
+            every tree's nodes are recorded under its own tree index and
+            the callback sees each record.
+        """
+
+        seen = []
+        stats = dt.TrainingStats(callback=seen.append, trace_memory=True)
+        forest = dt.RandomForest(4, 3, .5, .5, max_bins=32, n_jobs=2,
+                                 random_state=2, stats=stats)
+        forest.fit(self.features, self.classes)
+        arrays = stats.as_arrays()
+
+        assert stats.summary()['trees'] == 4
+        for i, tree in enumerate(forest.trees):
+            assert np.count_nonzero(arrays['tree'] == i) == len(tree.flat.feature)
+        assert len(seen) == len(stats.records)
+        assert stats.summary()['bytes'] > 0
+
+
+class EarlyStoppingTests(unittest.TestCase):
+    """Tests for the growth limits and cost-complexity pruning."""
+
+    def setUp(self):
+        """Set up test data.
+        """
+        rng = np.random.RandomState(9)
+        self.features = rng.uniform(-1, 1, size=(600, 4))
+        self.classes = (self.features[:, 0] + self.features[:, 1] *
+                        self.features[:, 2] > 0).astype(int)
+        flip = rng.rand(600) < .1
+        self.classes[flip] = 1 - self.classes[flip]
+
+    def leaf_sizes(self, tree):
+        """Return the training examples in each leaf of a tree."""
+        counts = np.bincount(tree.flat.apply(self.features))
+        return counts[tree.flat.feature < 0]
+
+    def test_min_samples_leaf(self):
+        """Test the smallest leaf of exact and histogram trees.
+
+        Asserts:
+            no leaf holds fewer than min_samples_leaf training examples.
+        """
+
+        for max_bins in (None, 32):
+            tree = dt.DecisionTree(max_bins=max_bins, min_samples_leaf=25)
+            tree.fit(self.features, self.classes)
+            assert self.leaf_sizes(tree).min() >= 25
+
+    def test_max_leaf_nodes(self):
+        """Test best-first growth.
+
+        Asserts:
+            the tree has exactly max_leaf_nodes leaves and its first split
+            is the root split of the unlimited tree.
+        """
+
+        full = dt.DecisionTree()
+        full.fit(self.features, self.classes)
+        tree = dt.DecisionTree(max_leaf_nodes=6)
+        tree.fit(self.features, self.classes)
+
+        assert np.count_nonzero(tree.flat.feature < 0) == 6
+        assert tree.flat.feature[0] == full.flat.feature[0]
+        assert tree.flat.threshold[0] == full.flat.threshold[0]
+
+    def test_min_impurity_decrease(self):
+        """Test the least weighted impurity decrease of a split.
+
+        Asserts:
+            a larger min_impurity_decrease gives fewer nodes.
+        """
+
+        sizes = []
+        for decrease in (0.0, 0.001, 0.01):
+            tree = dt.DecisionTree(min_impurity_decrease=decrease)
+            tree.fit(self.features, self.classes)
+            sizes.append(len(tree.flat.feature))
+        assert sizes[0] > sizes[1] > sizes[2]
+
+    def test_prune(self):
+        """Test cost-complexity pruning.
+
+        Asserts:
+            ccp_alpha of zero keeps the tree, a positive one shrinks it to
+            the tree fitted with that ccp_alpha, and a huge one leaves the
+            majority class at the root.
+        """
+
+        tree = dt.DecisionTree()
+        tree.fit(self.features, self.classes)
+        num_nodes = len(tree.flat.feature)
+        tree.prune(0.0)
+        assert len(tree.flat.feature) == num_nodes
+
+        pruned = dt.DecisionTree(ccp_alpha=0.005)
+        pruned.fit(self.features, self.classes)
+        tree.prune(0.005)
+        assert len(tree.flat.feature) < num_nodes
+        assert np.array_equal(tree.flat.feature, pruned.flat.feature)
+        assert tree.classify(self.features) == pruned.classify(self.features)
+
+        tree.prune(1.0)
+        assert len(tree.flat.feature) == 1
+        assert tree.flat.value[0] == np.argmax(np.bincount(self.classes))
+
+    def test_forest_and_save(self):
+        """Test the limits passed to forest trees and saved models.
+
+        Asserts:
+            every forest tree respects max_leaf_nodes and a loaded tree
+            keeps its limits.
+        """
+
+        forest = dt.RandomForest(3, 8, .8, .5, max_leaf_nodes=5,
+                                 min_samples_leaf=10, random_state=0)
+        forest.fit(self.features, self.classes)
+        for tree in forest.trees:
+            assert np.count_nonzero(tree.flat.feature < 0) <= 5
+
+        tree = dt.DecisionTree(min_samples_leaf=10, ccp_alpha=0.001)
+        tree.fit(self.features, self.classes)
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'tree.bin')
+            tree.save(path)
+            loaded = dt.DecisionTree.load(path)
+        assert loaded.params() == tree.params()
+        assert loaded.classify(self.features) == tree.classify(self.features)
+
+
+class GrowthPolicyTests(unittest.TestCase):
+    """Tests for the depth, breadth and best first growth schedulers."""
+
+    def setUp(self):
+        """Set up test data.
+        """
+        rng = np.random.RandomState(4)
+        self.features = rng.uniform(-1, 1, size=(500, 4))
+        self.classes = (self.features[:, 0] * self.features[:, 1] +
+                        self.features[:, 2] > 0).astype(int)
+
+    def test_policies_grow_same_tree(self):
+        """Test unlimited growth under every policy.
+
+        Asserts:
+            exact and histogram trees classify identically whatever order
+            their nodes were split in.
+        """
+
+        for max_bins in (None, 16):
+            outputs = []
+            for growth in dt.GROWTH_POLICIES:
+                tree = dt.DecisionTree(6, max_bins, growth=growth)
+                tree.fit(self.features, self.classes)
+                outputs.append(tree.classify(self.features))
+            assert outputs[0] == outputs[1] == outputs[2]
+
+    def test_leaf_budget(self):
+        """Test every policy under max_leaf_nodes.
+
+        Asserts:
+            each tree has max_leaf_nodes leaves, breadth first growth
+            fills whole levels and unknown policies are rejected.
+        """
+
+        for growth in dt.GROWTH_POLICIES:
+            tree = dt.DecisionTree(max_leaf_nodes=7, growth=growth)
+            tree.fit(self.features, self.classes)
+            assert np.count_nonzero(tree.flat.feature < 0) == 7
+
+        stats = dt.TrainingStats()
+        tree = dt.DecisionTree(max_leaf_nodes=8, growth='breadth', stats=stats)
+        tree.fit(self.features, self.classes)
+        assert stats.as_arrays()['depth'].max() == 3
+        with self.assertRaises(ValueError):
+            dt.DecisionTree(growth='random')
+
+    def test_deep_tree_without_recursion(self):
+        """Test a tree deeper than the recursion limit.
+
+        Asserts:
+            a chain of alternating classes is learned exactly.
+        """
+
+        features = np.arange(3000, dtype=float)[:, None]
+        classes = np.arange(3000) % 2
+        tree = dt.DecisionTree()
+        tree.fit(features, classes)
+
+        assert dt.accuracy(tree.classify(features), classes) == 1
+
+
+class FeatureParallelSearchTests(unittest.TestCase):
+    """Tests for split search over feature ranges on a thread pool."""
+
+    def setUp(self):
+        """Set up test data and search every node in parallel.
+        """
+        rng = np.random.RandomState(12)
+        self.features = rng.uniform(-1, 1, size=(400, 9))
+        self.features[:, 5] = self.features[:, 1]
+        self.classes = (self.features[:, 1] + self.features[:, 7] *
+                        self.features[:, 3] > 0).astype(int)
+        self.min_cells = dt.PARALLEL_SEARCH_MIN_CELLS
+        dt.PARALLEL_SEARCH_MIN_CELLS = 0
+
+    def tearDown(self):
+        """Restore the parallel search threshold.
+        """
+        dt.PARALLEL_SEARCH_MIN_CELLS = self.min_cells
+
+    def test_parallel_tree_matches_serial(self):
+        """Test exact and histogram trees grown with several threads.
+
+        Asserts:
+            the nodes equal those of the single threaded tree, including
+            ties between the duplicated columns 1 and 5.
+        """
+
+        for max_bins in (None, 16):
+            serial = dt.DecisionTree(6, max_bins)
+            serial.fit(self.features, self.classes)
+            parallel = dt.DecisionTree(6, max_bins, n_jobs=4)
+            parallel.fit(self.features, self.classes)
+            for name in dt.FLAT_TREE_FIELDS:
+                assert np.array_equal(getattr(serial.flat, name),
+                                      getattr(parallel.flat, name))
+            assert 5 not in parallel.flat.feature
+
+    def test_search_column_ranges(self):
+        """Test the reduction of per-range splits.
+
+        Asserts:
+            column positions are made absolute, the largest gain wins and
+            ranges without a split are skipped.
+        """
+
+        gains = [0.1, np.nan, 0.4, 0.4, 0.2]
+
+        def search(begin, end):
+            found = [(i, gains[i]) for i in range(begin, end)
+                     if not np.isnan(gains[i])]
+            if not found:
+                return None, None, 0.0
+            column, gain = max(found, key=lambda item: item[1])
+            return column - begin, 'bin', gain
+
+        with dt.search_pool(3) as (pool, num_workers):
+            assert dt.search_column_ranges(search, 5, 5, pool,
+                                           num_workers) == (2, 'bin', 0.4)
+            assert dt.search_column_ranges(search, 2, 2, pool,
+                                           num_workers)[0] == 0
+
+
+class SplitSearchTests(unittest.TestCase):
+    """Tests for the sorted-sweep split search."""
+
+    def setUp(self):
+        """Set up test data.
+        """
+        rng = np.random.RandomState(0)
+        self.features = rng.uniform(-1, 1, size=(60, 3))
+        self.classes = (self.features[:, 1] > 0.123).astype(int)
+
+    def test_best_split_exact_threshold(self):
+        """Test that the sweep finds a split between two adjacent values.
+
+        Asserts:
+            the split separates the classes perfectly on the right feature.
+        """
+
+        sorted_index = dt.presort_features(self.features)
+        feature, threshold, gain, num_left = dt.best_split(
+            self.features, self.classes, sorted_index)
+
+        assert feature == 1
+        assert np.array_equal(self.features[:, 1] <= threshold,
+                              self.classes == 0)
+        assert num_left == np.sum(self.classes == 0)
+        assert round(gain, 6) == round(dt.gini_gain(
+            self.classes, [self.classes[self.classes == 0],
+                           self.classes[self.classes == 1]]), 6)
+
+    def test_split_search_in_chunks(self):
+        """Test searching a few features at a time.
+
+        Asserts:
+            a tree grown with one feature per search range equals one
+            grown with a single range.
+        """
+
+        whole = dt.DecisionTree()
+        whole.fit(self.features, self.classes)
+        chunk_cells = dt.SEARCH_CHUNK_CELLS
+        dt.SEARCH_CHUNK_CELLS = 1
+        try:
+            chunked = dt.DecisionTree()
+            chunked.fit(self.features, self.classes)
+        finally:
+            dt.SEARCH_CHUNK_CELLS = chunk_cells
+
+        for name in dt.FLAT_TREE_FIELDS:
+            assert np.array_equal(getattr(whole.flat, name),
+                                  getattr(chunked.flat, name))
+
+    def test_no_features(self):
+        """Test forests whose trees draw no attributes.
+
+        Asserts:
+            exact and histogram trees become a single leaf.
+        """
+
+        for max_bins in (None, 16):
+            forest = dt.RandomForest(2, 3, .5, .1, max_bins=max_bins,
+                                     random_state=0)
+            forest.fit(self.features, self.classes)
+            for tree in forest.trees:
+                assert len(tree.flat.feature) == 1
+
+    def test_best_split_matches_gini_gain(self):
+        """Test the sweep against gini_gain on every candidate threshold.
+
+        Asserts:
+            no candidate threshold has a larger gini gain.
+        """
+
+        classes = (self.features.sum(axis=1) > 0).astype(int)
+        sorted_index = dt.presort_features(self.features)
+        _, _, gain, _ = dt.best_split(self.features, classes, sorted_index)
+
+        best = 0.0
+        for i in range(self.features.shape[1]):
+            for value in np.unique(self.features[:, i])[:-1]:
+                left = self.features[:, i] <= value
+                best = max(best, dt.gini_gain(
+                    classes, [classes[left], classes[~left]]))
+
+        assert round(gain, 9) == round(best, 9)
+
+    def test_partition_in_place(self):
+        """Test stable in-place partitioning of an index buffer segment.
+
+        Asserts:
+            only the segment changes and both parts keep their order.
+        """
+
+        index = np.array([[9, 4, 7, 1, 8, 3],
+                          [9, 1, 3, 4, 7, 8]])
+        mask = np.isin(index[:, 1:5], [1, 7])
+        middle = dt.partition_in_place(index, 1, 5, mask)
+
+        assert middle == 3
+        assert np.array_equal(index, [[9, 7, 1, 4, 8, 3],
+                                      [9, 1, 7, 3, 4, 8]])
+
+    def test_best_split_constant_features(self):
+        """Test a node whose rows cannot be separated.
+
+        Asserts:
+            no split is returned.
+        """
+
+        features = np.ones((4, 2))
+        classes = np.array([0, 1, 0, 1])
+        sorted_index = dt.presort_features(features)
+
+        assert dt.best_split(features, classes, sorted_index)[0] is None
+
+    def test_gini_of_large_labels(self):
+        """Test gini functions on labels far larger than their number.
+
+        Asserts:
+            the counts hold one column per label seen and the gains equal
+            those of small labels.
+        """
+
+        large = 5 * 10 ** 7
+        assert dt.count_classes([[0, large], [large]]).shape == (2, 2)
+        assert dt.gini_gain([0, large], [[0], [large]]) == dt.gini_gain(
+            [0, 1], [[0], [1]])
+        assert dt.gini_impurity([5, 9, 9]) == dt.gini_impurity([0, 1, 1])
+
+    def test_gini_from_counts(self):
+        """Test the counts-based gini functions against the class vectors.
+
+        Asserts:
+            impurity and gain from counts match gini_impurity and
+            gini_gain for three classes.
+        """
+
+        parent = [0, 2, 2, 1, 0, 2, 1, 1, 2]
+        left, right = parent[:4], parent[4:]
+        counts = np.array([[1, 1, 2], [1, 2, 2]])
+
+        assert np.allclose(dt.gini_impurity_counts(counts),
+                           [dt.gini_impurity(left) - 1e-8,
+                            dt.gini_impurity(right) - 1e-8])
+        assert dt.gini_impurity_counts([0, 0]) == 0.0
+        gain = dt.gini_gain_counts(counts.sum(axis=0), counts)
+        assert round(gain, 9) == round(dt.gini_gain(parent, [left, right]), 9)
+
+class HistogramTrainingTests(unittest.TestCase):
+    """Tests for binned features and histogram split search."""
+
+    def setUp(self):
+        """Set up test data.
+        """
+        self.train_features, self.train_classes = dt.load_csv(
+            './data/part23_data.csv')
+
+    def test_bin_features_edges(self):
+        """Test that bins agree with their threshold edges.
+
+        Asserts:
+            binned data is uint8 and bin <= b exactly when x <= edge b.
+        """
+
+        binned, bin_edges = dt.bin_features(self.train_features, 32)
+
+        assert binned.dtype == np.uint8
+        assert binned.max() < 32
+        for i, edges in enumerate(bin_edges):
+            for b in range(len(edges)):
+                assert np.array_equal(binned[:, i] <= b,
+                                      self.train_features[:, i] <= edges[b])
+
+    def test_bin_features_max_bins(self):
+        """Test bin count bounds.
+
+        Asserts:
+            more than 256 bins is refused.
+        """
+
+        with self.assertRaises(ValueError):
+            dt.bin_features(self.train_features, 300)
+
+    def test_histogram_decision_tree(self):
+        """Test a histogram tree on the full data.
+
+        Asserts:
+            classification is 100% correct with one bin per value.
+        """
+
+        tree = dt.DecisionTree(max_bins=256)
+        tree.fit(self.train_features, self.train_classes)
+        output = tree.classify(self.train_features)
+
+        assert (output == self.train_classes).all()
+
+    def test_chunked_class_histogram(self):
+        """Test counting a histogram a few columns at a time.
+
+        Asserts:
+            plain, grouped and statistic histograms equal those counted
+            in one chunk.
+        """
+
+        binned, _ = dt.bin_features(self.train_features, 16)
+        classes = self.train_classes.astype(np.intp)
+        rows = np.arange(len(classes))
+        columns = np.arange(binned.shape[1])
+        groups = rows % 3
+        stats = np.column_stack([np.ones(len(classes)), classes])
+
+        def histograms():
+            return (dt.class_histogram(binned, classes, rows, columns, 16),
+                    dt.class_histogram(binned, classes, rows, columns, 16, 2,
+                                       groups, 3),
+                    dt.class_histogram(binned, stats, rows, columns, 16, 2))
+
+        whole = histograms()
+        chunk_cells = dt.HISTOGRAM_CHUNK_CELLS
+        dt.HISTOGRAM_CHUNK_CELLS = len(rows) * 2
+        try:
+            chunked = histograms()
+        finally:
+            dt.HISTOGRAM_CHUNK_CELLS = chunk_cells
+
+        assert whole[1].shape == (3, len(columns), 16, 2)
+        for a, b in zip(whole, chunked):
+            assert np.array_equal(a, b)
+        assert np.array_equal(whole[1].sum(axis=0), whole[0])
+        assert np.array_equal(whole[2][..., 0], whole[0].sum(axis=2))
+        assert np.array_equal(whole[2][..., 1], whole[0][..., 1])
+
+    def test_histogram_subtraction(self):
+        """Test sibling histograms derived by subtraction.
+
+        Asserts:
+            both children's histograms equal a direct count of their rows.
+        """
+
+        binned, bin_edges = dt.bin_features(self.train_features, 64)
+        splitter = dt.HistogramSplitter(binned, bin_edges, self.train_classes)
+        root = splitter.root()
+        left, right = splitter.partition(root, splitter.find_split(root))
+
+        for start, end, histogram in (left, right):
+            rows = splitter.rows[start:end]
+            assert np.array_equal(histogram, splitter.histogram(rows))
+
+    def test_histogram_random_forest(self):
+        """Test a forest sharing one binned copy of the data.
+
+        Asserts:
+            every tree trained and accuracy is greater than 90%.
+        """
+
+        forest = dt.RandomForest(20, 5, .5, .75, max_bins=64)
+        forest.fit(self.train_features, self.train_classes)
+        output = forest.classify(self.train_features).ravel()
+
+        assert len(forest.trees) == 20
+        assert dt.accuracy(output, self.train_classes) > .90
+
+class FlatTreeTests(unittest.TestCase):
+    """Tests for the flat array tree and batch prediction."""
+
+    def setUp(self):
+        """Set up test data.
+        """
+        self.features, self.classes = dt.load_csv(
+            './data/mod_complex_binary.csv')
+
+    def test_predict_batch_matches_decide(self):
+        """Test batch prediction against walking the node objects.
+
+        Asserts:
+            both give the same label for every example, in any block size.
+        """
+
+        tree = dt.DecisionTree(depth_limit=6)
+        tree.fit(self.features, self.classes)
+        expected = [tree.root.decide(row) for row in self.features]
+
+        for block_size in (1, 37, 65536):
+            output = tree.predict_batch(self.features, block_size)
+            assert np.array_equal(output, expected)
+
+    def test_learned_nodes_hold_splits(self):
+        """Test that learned nodes expose their split parameters.
+
+        Asserts:
+            every internal node has a readable <= Split agreeing with decide.
+        """
+
+        tree = dt.DecisionTree(depth_limit=3)
+        tree.fit(self.features, self.classes)
+        nodes = [tree.root]
+        while nodes:
+            node = nodes.pop()
+            if node.class_label is not None:
+                continue
+            split = node.split
+            assert split.operator == '<='
+            row = np.zeros(self.features.shape[1])
+            row[split.feature] = split.threshold
+            assert node.decision_function(row)
+            nodes.extend([node.left, node.right])
+
+    def test_split_operators(self):
+        """Test Split evaluation and the hand built tree's splits.
+
+        Asserts:
+            splits compare as named and unknown operators are refused.
+        """
+
+        assert dt.Split(1, 2.0, '<')([0, 1.5])
+        assert not dt.Split(1, 2.0, '>')([0, 1.5])
+        assert dt.build_decision_tree().split.operator == '=='
+        with self.assertRaises(ValueError):
+            dt.Split(0, 1.0, '~')
+
+    def test_predict_batch_single_leaf(self):
+        """Test batch prediction with a tree that is only a leaf.
+
+        Asserts:
+            every example gets the leaf's label.
+        """
+
+        tree = dt.DecisionTree()
+        tree.fit(self.features[:5], np.ones(5))
+
+        assert np.array_equal(tree.predict_batch(self.features),
+                              np.ones(len(self.features)))
+
+    def test_assigned_root_replaces_fit(self):
+        """Test assigning a hand built root to a fitted tree.
+
+        Asserts:
+            classify walks the new nodes instead of the fitted arrays.
+        """
+
+        tree = dt.DecisionTree()
+        tree.fit(self.features[:5], np.ones(5))
+        tree.root = dt.build_decision_tree()
+        row = np.array([[0, 0, 1, 0]])
+
+        assert tree.flat is None
+        assert tree.classify(row) == [tree.root.decide(row[0])] == [0]
+
+class ParallelForestTests(unittest.TestCase):
+    """Tests for training and classifying forests in parallel."""
+
+    def setUp(self):
+        """Set up test data.
+        """
+        self.features, self.classes = dt.load_csv(
+            './data/mod_complex_binary.csv')
+
+    def test_parallel_fit_matches_serial(self):
+        """Test that worker processes train the same trees.
+
+        Asserts:
+            feature subsets and votes match a single process fit.
+        """
+
+        forests = []
+        for n_jobs in (1, 2):
+            np.random.seed(7)
+            forest = dt.RandomForest(10, 3, .3, .5, n_jobs=n_jobs)
+            forest.fit(self.features, self.classes)
+            forests.append(forest)
+
+        for serial, parallel in zip(*[f.feature_list for f in forests]):
+            assert np.array_equal(serial, parallel)
+        assert np.array_equal(forests[0].classify(self.features),
+                              forests[1].classify(self.features))
+
+    def test_concurrent_serial_fits(self):
+        """Test forests fitted at the same time from threads.
+
+        Asserts:
+            each forest equals the same forest fitted alone.
+        """
+
+        def fit(seed):
+            forest = dt.RandomForest(6, 3, .3, .5, random_state=seed)
+            forest.fit(self.features, self.classes)
+            return [tree.flat.threshold for tree in forest.trees]
+
+        with ThreadPoolExecutor(4) as pool:
+            results = list(pool.map(fit, [1, 2, 3, 4]))
+        for seed, thresholds in zip([1, 2, 3, 4], results):
+            for a, b in zip(fit(seed), thresholds):
+                assert np.array_equal(a, b)
+
+    def test_parallel_deep_trees(self):
+        """Test worker processes returning trees deeper than the recursion limit.
+
+        Asserts:
+            the forest fits, and both trees classify their own chain of
+            alternating classes exactly.
+        """
+
+        features = np.arange(3000.)[:, None]
+        classes = np.arange(3000) % 2
+        forest = dt.RandomForest(2, float('inf'), 4.0, 1.0, random_state=0,
+                                 n_jobs=2)
+        forest.fit(features, classes)
+
+        for tree, inbag in zip(forest.trees, forest.inbag_list):
+            rows = np.unpackbits(inbag)[:3000].astype(bool)
+            assert dt.accuracy(tree.classify(features[rows]), classes[rows]) == 1
+
+    def test_random_state_reproducible(self):
+        """Test seeding a forest with random_state.
+
+        Asserts:
+            equal seeds give equal forests, other seeds differ.
+        """
+
+        def fit(random_state, n_jobs=1):
+            forest = dt.RandomForest(8, 3, .3, .5, n_jobs=n_jobs,
+                                     random_state=random_state)
+            forest.fit(self.features, self.classes)
+            return [tree.flat.threshold for tree in forest.trees]
+
+        first = fit(11)
+        for second in (fit(11), fit(11, n_jobs=2),
+                       fit(np.random.SeedSequence(11))):
+            for a, b in zip(first, second):
+                assert np.array_equal(a, b)
+        assert not all(np.array_equal(a, b) for a, b in zip(first, fit(12)))
+
+    def test_vote_counts_match_tree_votes(self):
+        """Test streamed forest votes against each tree's own output.
+
+        Asserts:
+            threaded, blocked class 1 vote counts equal the per-tree label
+            sums.
+        """
+
+        forest = dt.RandomForest(15, 4, .3, .5, n_jobs=2)
+        forest.fit(self.features, self.classes)
+        expected = sum(np.array(tree.classify(self.features[:, columns]))
+                       for tree, columns in zip(forest.trees,
+                                                forest.feature_list))
+
+        votes = forest.vote_counts(self.features, 100)
+        assert np.array_equal(votes[:, 1], expected)
+        assert np.array_equal(votes.sum(axis=1), np.full(len(expected), 15))
+        assert np.array_equal(forest.classify(self.features).ravel(),
+                              2 * expected > 15)
+
+    def test_out_of_bag_score(self):
+        """Test out-of-bag scoring while fitting.
+
+        Asserts:
+            in-bag bitmaps match the trees' draws and the out-of-bag
+            accuracy agrees with its confusion matrix.
+        """
+
+        forest = dt.RandomForest(30, 4, .5, .5, random_state=3,
+                                 oob_score=True)
+        forest.fit(self.features, self.classes)
+        confusion = forest.oob_confusion
+
+        assert len(forest.inbag_list) == 30
+        assert forest.inbag_list[0].nbytes == (len(self.classes) + 7) // 8
+        assert forest.oob_accuracy > .85
+        assert round(forest.oob_accuracy, 9) == round(
+            np.trace(confusion) / np.sum(confusion), 9)
+
 class VectorizationWarmUpTests(unittest.TestCase):
     """Tests the Warm Up exercises for Vectorization.
 
@@ -1,9 +1,53 @@
 import numpy as np
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import contextlib
+import heapq
+import itertools
+import json
+import mmap
+import operator
+import os
+import struct
 import time
+import tracemalloc
 
 
 
+class Split:
+    """Introspectable decision function testing one feature of an example.
+    Calling a Split on an example evaluates
+    example[feature] <operator> threshold.
+    """
+
+    OPERATORS = {'<=': operator.le, '<': operator.lt, '>=': operator.ge,
+                 '>': operator.gt, '==': operator.eq, '!=': operator.ne}
+
+    def __init__(self, feature, threshold, operator='<='):
+        """Create a split.
+        Args:
+            feature (int): index of the feature tested.
+            threshold (float): value the feature is compared against.
+            operator (str): one of '<=', '<', '>=', '>', '==' or '!='.
+        """
+
+        if operator not in self.OPERATORS:
+            raise ValueError('Unknown split operator: {}'.format(operator))
+        self.feature = feature
+        self.threshold = threshold
+        self.operator = operator
+        self.compare = self.OPERATORS[operator]
+
+    def __call__(self, feature):
+        """Test an example; True takes it to the left child."""
+
+        return self.compare(feature[self.feature], self.threshold)
+
+    def __repr__(self):
+        return 'Split(feature[{}] {} {!r})'.format(self.feature, self.operator,
+                                                   self.threshold)
+
+
 class DecisionNode:
     """Class to represent a single node in a decision tree."""
 
@@ -15,6 +59,7 @@ class DecisionNode:
             left (DecisionNode): left child node.
             right (DecisionNode): right child node.
             decision_function (func): function to decide left or right node.
+                A Split keeps the feature, threshold and operator readable.
             class_label (int): label for leaf node. Default is None.
         """
 
@@ -22,6 +67,15 @@ class DecisionNode:
         self.right = right
         self.decision_function = decision_function
         self.class_label = class_label
+        self.stats = None
+
+    @property
+    def split(self):
+        """The node's Split, or None for leaves and opaque functions."""
+
+        if isinstance(self.decision_function, Split):
+            return self.decision_function
+        return None
 
     def decide(self, feature):
         # """Get a child node based on the decision function.͏︆͏󠄃͏󠄌͏󠄍͏󠄂͏️͏󠄈͏︀͏︆
@@ -50,33 +104,422 @@ class DecisionNode:
             return self.right.decide(feature)
 
 
-def load_csv(data_file_path, class_index=-1):
-    """Load csv data in a numpy array.
+def split_classes(out, class_index=-1, dtype=float, class_dtype=float):
+    """Split a block of csv rows into features and classes.
     Args:
-        data_file_path (str): path to data file.
+        out (m x n): parsed csv rows.
         class_index (int): slice output by index.
+        dtype (type): dtype of the features.
+        class_dtype (type): dtype of the classes.
     Returns:
-        features, classes as numpy arrays if class_index is specified,
-            otherwise all as nump array.
+        features, classes as numpy arrays if class_index is -1 or 0,
+            otherwise all as numpy array.
     """
 
-    handle = open(data_file_path, 'r')
-    contents = handle.read()
-    handle.close()
-    rows = contents.split('\n')
-    out = np.array([[float(i) for i in r.split(',')] for r in rows if r])
-
     if(class_index == -1):
-        classes= out[:,class_index]
-        features = out[:,:class_index]
+        classes= out[:,class_index].astype(class_dtype)
+        features = out[:,:class_index].astype(dtype)
         return features, classes
     elif(class_index == 0):
-        classes= out[:, class_index]
-        features = out[:, 1:]
+        classes= out[:, class_index].astype(class_dtype)
+        features = out[:, 1:].astype(dtype)
         return features, classes
 
     else:
-        return out
+        return out.astype(dtype)
+
+
+def iter_csv(data_file_path, class_index=-1, block_rows=65536, dtype=float,
+             class_dtype=float):
+    """Read csv data as a stream of row blocks.
+    Each block of lines is parsed in one call into a numpy array, so only
+    one block of the file is ever held in memory.
+    Args:
+        data_file_path (str): path to data file.
+        class_index (int): slice output by index.
+        block_rows (int): lines read per block; blank lines are dropped,
+            so a block can hold fewer rows.
+        dtype (type): dtype of the features.
+        class_dtype (type): dtype of the classes.
+    Yields:
+        features, classes blocks as numpy arrays if class_index is -1 or 0,
+            otherwise blocks of all columns.
+    """
+
+    with open(data_file_path, 'r') as handle:
+        while True:
+            chunk = list(itertools.islice(handle, block_rows))
+            if not chunk:
+                return
+            lines = [line for line in chunk if line.strip()]
+            if not lines:
+                continue
+            text = ''.join(lines).replace('\r', '').replace('\n', ',')
+            out = np.fromstring(text, dtype=float, sep=',').reshape(len(lines), -1)
+            yield split_classes(out, class_index, dtype, class_dtype)
+
+
+def count_lines(data_file_path, chunk_bytes=1 << 20, skip_blank=False):
+    """Count the lines of a file without decoding it.
+    Args:
+        data_file_path (str): path to data file.
+        chunk_bytes (int): bytes read at a time.
+        skip_blank (bool): count only lines holding more than whitespace,
+            the rows iter_csv() yields. Slower, as every line is looked at.
+    Returns:
+        Number of lines, counting a last line with no line break.
+    """
+
+    if skip_blank:
+        with open(data_file_path, 'rb') as handle:
+            return sum(1 for line in handle if line.strip())
+
+    num_lines = 0
+    last = b'\n'
+    with open(data_file_path, 'rb') as handle:
+        for chunk in iter(lambda: handle.read(chunk_bytes), b''):
+            num_lines += chunk.count(b'\n')
+            last = chunk[-1:]
+    return num_lines + (last != b'\n')
+
+
+def load_csv(data_file_path, class_index=-1, dtype=float, class_dtype=float,
+             block_rows=65536):
+    """Load csv data in a numpy array.
+    The file is parsed block by block straight into arrays preallocated
+    from a line count, so it never exists as Python lists of floats.
+    Args:
+        data_file_path (str): path to data file.
+        class_index (int): slice output by index.
+        dtype (type): dtype of the features, e.g. np.float32.
+        class_dtype (type): dtype of the classes, e.g. np.int8.
+        block_rows (int): lines parsed at a time.
+    Returns:
+        features, classes as numpy arrays if class_index is specified,
+            otherwise all as nump array.
+    """
+
+    num_rows = count_lines(data_file_path)
+    outputs = None
+    filled = 0
+    for block in iter_csv(data_file_path, class_index, block_rows, dtype,
+                          class_dtype):
+        if not isinstance(block, tuple):
+            block = (block,)
+        if outputs is None:
+            outputs = tuple(np.empty((num_rows,) + part.shape[1:], part.dtype)
+                            for part in block)
+        for output, part in zip(outputs, block):
+            output[filled:filled + len(part)] = part
+        filled += len(block[0])
+
+    if outputs is None:
+        raise ValueError('No rows in {}'.format(data_file_path))
+    outputs = tuple(output[:filled] for output in outputs)
+    if len(outputs) == 1:
+        return outputs[0]
+    return outputs
+
+
+class CSRMatrix:
+    """Binary sparse matrix in compressed sparse row form.
+    The column indices of row i are indices[indptr[i]:indptr[i + 1]];
+    those entries are 1 and every other entry is 0.
+    """
+
+    def __init__(self, indptr, indices, num_columns=None):
+        """Wrap the row pointer and column index arrays.
+        Args:
+            indptr (m + 1 x 1): start of every row in indices.
+            indices (nnz x 1): column of every stored entry.
+            num_columns (int): number of columns. Default is one more than
+                the largest stored column.
+        """
+
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int64)
+        if num_columns is None:
+            num_columns = int(self.indices.max()) + 1 if len(self.indices) else 0
+        self.shape = (len(self.indptr) - 1, num_columns)
+
+        # Row-major keys of the stored entries, sorted for lookups.
+        rows = np.repeat(np.arange(self.shape[0]), np.diff(self.indptr))
+        self.keys = rows * self.shape[1] + self.indices
+        if np.any(self.keys[1:] < self.keys[:-1]):
+            order = np.argsort(self.keys, kind='mergesort')
+            self.keys = self.keys[order]
+            self.indices = self.indices[order]
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, rows):
+        """Select rows by a slice or an array of row indices.
+        Returns:
+            CSRMatrix of the selected rows.
+        """
+
+        if isinstance(rows, slice):
+            rows = np.arange(*rows.indices(self.shape[0]))
+        entry_rows, columns = self.row_entries(np.asarray(rows))
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(entry_rows, minlength=len(rows)), out=indptr[1:])
+        return CSRMatrix(indptr, columns, self.shape[1])
+
+    def row_entries(self, rows):
+        """Gather the stored entries of some rows.
+        Args:
+            rows (k x 1): row indices, repeats allowed.
+        Returns:
+            Tuple (position in rows of each entry, column of each entry).
+        """
+
+        starts = self.indptr[rows]
+        lengths = self.indptr[np.asarray(rows) + 1] - starts
+        entry_rows = np.repeat(np.arange(len(starts)), lengths)
+        first = np.cumsum(lengths) - lengths
+        positions = np.arange(lengths.sum()) - first[entry_rows] + starts[entry_rows]
+        return entry_rows, self.indices[positions]
+
+    def lookup(self, rows, columns):
+        """Read single entries without densifying.
+        Args:
+            rows (k x 1): row of each entry.
+            columns (k x 1): column of each entry.
+        Returns:
+            Array of k values, 1.0 where stored and 0.0 elsewhere.
+        """
+
+        keys = np.asarray(rows, dtype=np.int64) * self.shape[1] + columns
+        if not len(self.keys):
+            return np.zeros(len(keys))
+        found = np.searchsorted(self.keys, keys)
+        found[found == len(self.keys)] = 0
+        return (self.keys[found] == keys).astype(float)
+
+    def toarray(self):
+        """Return the dense (m x n) array."""
+
+        dense = np.zeros(self.shape)
+        entry_rows, columns = self.row_entries(np.arange(self.shape[0]))
+        dense[entry_rows, columns] = 1.0
+        return dense
+
+
+def load_sparse_csv(data_file_path, class_index=0, num_columns=None,
+                    class_dtype=float, block_rows=65536):
+    """Load csv rows listing the active features of each example.
+    Every line holds a class and then the indices of the example's
+    active features, as in challenge_train.csv; lines may differ in
+    length.
+    Args:
+        data_file_path (str): path to data file.
+        class_index (int): position of the class, 0 or -1.
+        num_columns (int): number of features. Default is one more than
+            the largest index seen.
+        class_dtype (type): dtype of the classes.
+        block_rows (int): lines parsed at a time.
+    Returns:
+        features as a CSRMatrix, classes as numpy array.
+    """
+
+    if class_index not in (0, -1):
+        raise ValueError('class_index must be 0 or -1')
+
+    classes, indices, lengths = [], [], []
+    with open(data_file_path, 'r') as handle:
+        while True:
+            chunk = list(itertools.islice(handle, block_rows))
+            if not chunk:
+                break
+            lines = [line for line in chunk if line.strip()]
+            if not lines:
+                continue
+            text = ''.join(lines).replace('\r', '').replace('\n', ',')
+            values = np.fromstring(text, dtype=float, sep=',')
+            widths = np.array([line.count(',') + 1 for line in lines])
+            ends = np.cumsum(widths)
+            label_at = ends - widths if class_index == 0 else ends - 1
+            is_label = np.zeros(len(values), dtype=bool)
+            is_label[label_at] = True
+            classes.append(values[label_at].astype(class_dtype))
+            indices.append(values[~is_label].astype(np.int64))
+            lengths.append(widths - 1)
+
+    lengths = np.concatenate(lengths)
+    indptr = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=indptr[1:])
+    return (CSRMatrix(indptr, np.concatenate(indices), num_columns),
+            np.concatenate(classes))
+
+
+ARRAYS_MAGIC = b'DTARRAYS'
+
+
+def create_arrays(data_file_path, specs, attributes=None):
+    """Create a binary file of named arrays and map it for writing.
+    The file is the magic bytes, the header length, a small JSON header
+    naming each array's dtype, shape, order and offset, then the raw
+    array data, each array aligned to 64 bytes.
+    Args:
+        data_file_path (str): path to data file.
+        specs (dict): array name -> (shape, dtype, order), order 'C' for
+            row-major or 'F' for column-major.
+        attributes (dict): extra JSON values stored in the header.
+    Returns:
+        dict of array name -> writable np.memmap.
+    """
+
+    entries = {}
+    offset = 0
+    for name, (shape, dtype, order) in specs.items():
+        dtype = np.dtype(dtype)
+        entries[name] = {'dtype': dtype.str, 'shape': [int(s) for s in shape],
+                         'order': order, 'offset': offset}
+        offset += -(-int(np.prod(shape)) * dtype.itemsize // 64) * 64
+    header = json.dumps({'arrays': entries,
+                         'attributes': attributes or {}}).encode()
+    data_start = -(-(len(ARRAYS_MAGIC) + 8 + len(header)) // 64) * 64
+
+    with open(data_file_path, 'wb') as handle:
+        handle.write(ARRAYS_MAGIC)
+        handle.write(struct.pack('<Q', len(header)))
+        handle.write(header)
+        handle.truncate(data_start + offset)
+
+    arrays = {}
+    for name, entry in entries.items():
+        entry['offset'] += data_start
+        arrays[name] = _map_array(data_file_path, entry, 'r+')
+    return arrays
+
+
+def _map_array(data_file_path, entry, mode):
+    """Map one array described by a header entry."""
+
+    shape = tuple(entry['shape'])
+    if int(np.prod(shape)) == 0:
+        return np.empty(shape, dtype=entry['dtype'], order=entry['order'])
+    return np.memmap(data_file_path, dtype=entry['dtype'], mode=mode,
+                     offset=entry['offset'], shape=shape, order=entry['order'])
+
+
+def save_arrays(data_file_path, arrays, orders=None, attributes=None):
+    """Write named arrays into one binary file.
+    Args:
+        data_file_path (str): path to data file.
+        arrays (dict): array name -> numpy array.
+        orders (dict): array name -> 'C' or 'F'. Default is 'C'.
+        attributes (dict): extra JSON values stored in the header.
+    """
+
+    orders = orders or {}
+    arrays = {name: np.asarray(array) for name, array in arrays.items()}
+    specs = {name: (array.shape, array.dtype, orders.get(name, 'C'))
+             for name, array in arrays.items()}
+    mapped = create_arrays(data_file_path, specs, attributes)
+    for name, array in arrays.items():
+        mapped[name][...] = array
+        if isinstance(mapped[name], np.memmap):
+            mapped[name].flush()
+
+
+def load_arrays(data_file_path, memory_map=True):
+    """Read the named arrays of a file written by save_arrays().
+    Args:
+        data_file_path (str): path to data file.
+        memory_map (bool): map the arrays read-only instead of reading them.
+    Returns:
+        Tuple (dict of array name -> array, dict of header attributes).
+    """
+
+    with open(data_file_path, 'rb') as handle:
+        if handle.read(len(ARRAYS_MAGIC)) != ARRAYS_MAGIC:
+            raise ValueError('{} is not an array file'.format(data_file_path))
+        header_length, = struct.unpack('<Q', handle.read(8))
+        header = json.loads(handle.read(header_length).decode())
+    data_start = -(-(len(ARRAYS_MAGIC) + 8 + header_length) // 64) * 64
+
+    arrays = {}
+    for name, entry in header['arrays'].items():
+        entry['offset'] += data_start
+        array = _map_array(data_file_path, entry, 'r')
+        arrays[name] = array if memory_map else np.array(array, order=entry['order'])
+    return arrays, header['attributes']
+
+
+def save_dataset(data_file_path, features, classes):
+    """Write features and classes in the binary dataset format.
+    Features are stored column-major, so each feature column is one
+    contiguous run of the file.
+    Args:
+        data_file_path (str): path to data file.
+        features (m x n): m examples with n features.
+        classes (m x 1): Array of Classes.
+    """
+
+    save_arrays(data_file_path, {'features': features, 'classes': classes},
+                orders={'features': 'F'})
+
+
+def csv_to_dataset(csv_file_path, data_file_path, class_index=-1,
+                   dtype=float, class_dtype=float, block_rows=65536):
+    """Convert a csv file to the binary dataset format block by block.
+    Args:
+        csv_file_path (str): path to the csv file.
+        data_file_path (str): path to the binary file written.
+        class_index (int): position of the class, -1 or 0.
+        dtype (type): dtype of the features.
+        class_dtype (type): dtype of the classes.
+        block_rows (int): lines converted at a time.
+    Returns:
+        Number of examples written.
+    """
+
+    if class_index not in (0, -1):
+        raise ValueError('class_index must be 0 or -1')
+
+    num_rows = count_lines(csv_file_path, skip_blank=True)
+    blocks = iter_csv(csv_file_path, class_index, block_rows, dtype,
+                      class_dtype)
+    first = next(blocks, None)
+    if first is None:
+        raise ValueError('No rows in {}'.format(csv_file_path))
+    features, classes = first
+    mapped = create_arrays(data_file_path, {
+        'features': ((num_rows, features.shape[1]), features.dtype, 'F'),
+        'classes': ((num_rows,), classes.dtype, 'C')})
+
+    filled = 0
+    for features, classes in itertools.chain([first], blocks):
+        mapped['features'][filled:filled + len(classes)] = features
+        mapped['classes'][filled:filled + len(classes)] = classes
+        filled += len(classes)
+
+    for array in mapped.values():
+        array.flush()
+    return filled
+
+
+def load_dataset(data_file_path, memory_map=True):
+    """Load a binary dataset without reading it into memory.
+    Args:
+        data_file_path (str): path to data file.
+        memory_map (bool): map the file read-only instead of reading it.
+    Returns:
+        features, classes as numpy arrays (np.memmap when mapped).
+    """
+
+    arrays, _ = load_arrays(data_file_path, memory_map)
+    return arrays['features'], arrays['classes']
+
+
+def as_examples(features):
+    """Return features as an array, leaving a CSRMatrix sparse."""
+
+    if isinstance(features, CSRMatrix):
+        return features
+    return np.asanyarray(features)
 
 
 def build_decision_tree():
@@ -87,15 +530,11 @@ def build_decision_tree():
         The root node of the decision tree.
     """
 
-    func0 = lambda feature: feature[0] == 0
-    decision_tree_root = DecisionNode(None, None, func0, None)
+    decision_tree_root = DecisionNode(None, None, Split(0, 0, '=='), None)
     decision_tree_root.right = DecisionNode(None, None, None, 1)
-    func1 = lambda feature: feature[3] == 0
-    decision_tree_root.left = DecisionNode(None, None, func1, None)
-    func2 = lambda feature: feature[2] == 1
-    func3 = lambda feature: feature[1] == 1
-    decision_tree_root.left.right = DecisionNode(None, None, func3, None)
-    decision_tree_root.left.left = DecisionNode(None, None, func2, None)
+    decision_tree_root.left = DecisionNode(None, None, Split(3, 0, '=='), None)
+    decision_tree_root.left.right = DecisionNode(None, None, Split(1, 1, '=='), None)
+    decision_tree_root.left.left = DecisionNode(None, None, Split(2, 1, '=='), None)
     decision_tree_root.left.right.left = DecisionNode(None, None,None, 0)
     decision_tree_root.left.right.right = DecisionNode(None, None, None, 1)
     decision_tree_root.left.left.right = DecisionNode(None, None, None, 1)
@@ -104,6 +543,173 @@ def build_decision_tree():
     return decision_tree_root
 
 
+def integer_codes(values):
+    """Return labels as codes when they are a dense range of integers.
+    Labels that take every value from 2 up to the largest, and otherwise
+    only 0 or 1, are their own codes, so numbering them needs no sort.
+    Args:
+        values (m x 1): labels.
+    Returns:
+        Array of m codes, or None when some label is not a non-negative
+            integer or the labels leave gaps above 1.
+    """
+
+    if values.dtype.kind not in 'biuf':
+        return None
+    codes = values.astype(np.intp)
+    if not len(values):
+        return codes
+    if codes.min() < 0 or codes.max() > len(values) + 1:
+        return None
+    if not np.array_equal(codes, values) or not np.bincount(codes)[2:].all():
+        return None
+    return codes
+
+
+def encode_labels(values, labels):
+    """Map labels to their positions in a sorted array of known labels.
+    Args:
+        values (m x 1): labels to encode.
+        labels (k x 1): sorted known labels.
+    Returns:
+        Array of m positions.
+    """
+
+    positions = np.searchsorted(labels, values)
+    positions[positions == len(labels)] = 0
+    if len(values) and not np.array_equal(labels[positions], values):
+        raise ValueError('Found labels outside of {}'.format(labels))
+    return positions
+
+
+def confusion_counts(classifier_output, true_labels, labels=None):
+    """Count every (true, predicted) label pair in one pass.
+    Each pair is encoded as true * k + predicted and counted with a single
+    np.bincount, for any number of classes.
+    Args:
+        classifier_output (list(int)): output from classifier.
+        true_labels: (list(int): correct classified labels.
+        labels (list): the possible labels. Default is 0 .. the largest
+            label (at least 0 and 1) when the labels are a dense range
+            of integers, see integer_codes(), otherwise every label seen.
+    Returns:
+        Tuple (k x k confusion counts, true labels by row and predicted
+            labels by column; array of the k labels).
+    """
+
+    classifier_output = np.asarray(classifier_output).ravel()
+    true_labels = np.asarray(true_labels).ravel()
+    if len(classifier_output) != len(true_labels):
+        raise ValueError('classifier_output and true_labels differ in length')
+
+    if labels is None:
+        both = np.concatenate([classifier_output, true_labels])
+        whole = integer_codes(both)
+        if whole is not None:
+            num_labels = max(int(whole.max()) + 1 if len(both) else 0, 2)
+            labels = np.arange(num_labels)
+            predicted = whole[:len(classifier_output)]
+            actual = whole[len(classifier_output):]
+        else:
+            labels = np.unique(both)
+            predicted = encode_labels(classifier_output, labels)
+            actual = encode_labels(true_labels, labels)
+    else:
+        labels = np.sort(np.asarray(labels))
+        predicted = encode_labels(classifier_output, labels)
+        actual = encode_labels(true_labels, labels)
+
+    num_labels = len(labels)
+    counts = np.bincount(actual * num_labels + predicted,
+                         minlength=num_labels * num_labels)
+    return counts.reshape(num_labels, num_labels), labels
+
+
+def metrics_from_confusion(confusion, labels):
+    """Derive classifier metrics from confusion counts.
+    Args:
+        confusion (k x k): counts from confusion_counts().
+        labels (k x 1): label of each row and column.
+    Returns:
+        dict with the confusion counts and labels, the accuracy, per-label
+            arrays of precision, recall, f1 and support, and their macro
+            averages.
+    """
+
+    confusion = np.asarray(confusion)
+    correct = np.diag(confusion).astype(float)
+    support = confusion.sum(axis=1)
+    predicted = confusion.sum(axis=0)
+    total = confusion.sum()
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision_per_label = correct / predicted
+        recall_per_label = correct / support
+        f1 = (2 * precision_per_label * recall_per_label /
+              (precision_per_label + recall_per_label))
+        accuracy_value = correct.sum() / total
+
+    return {'labels': labels, 'confusion': confusion,
+            'accuracy': accuracy_value,
+            'precision': precision_per_label, 'recall': recall_per_label,
+            'f1': f1, 'support': support,
+            'macro_precision': np.nanmean(precision_per_label) if len(labels) else np.nan,
+            'macro_recall': np.nanmean(recall_per_label) if len(labels) else np.nan,
+            'macro_f1': np.nanmean(f1) if len(labels) else np.nan}
+
+
+def classification_metrics(classifier_output, true_labels, labels=None):
+    """Compute every classifier metric from one confusion pass.
+    Args:
+        classifier_output (list(int)): output from classifier.
+        true_labels: (list(int): correct classified labels.
+        labels (list): the possible labels, see confusion_counts().
+    Returns:
+        dict of metrics, see metrics_from_confusion().
+    """
+
+    return metrics_from_confusion(
+        *confusion_counts(classifier_output, true_labels, labels))
+
+
+class MetricsAccumulator:
+    """Accumulate confusion counts over chunks of predictions."""
+
+    def __init__(self, labels=None):
+        """Start with no counts.
+        Args:
+            labels (list): the possible labels. Default grows to every
+                label of confusion_counts() over the chunks seen.
+        """
+
+        self.fixed_labels = (None if labels is None
+                             else np.sort(np.asarray(labels)))
+        self.labels = self.fixed_labels
+        self.confusion = None
+
+    def update(self, classifier_output, true_labels):
+        """Add one chunk of predictions to the counts."""
+
+        confusion, labels = confusion_counts(classifier_output, true_labels,
+                                             self.fixed_labels)
+        if self.confusion is None:
+            self.confusion, self.labels = confusion, labels
+            return
+        merged = np.union1d(self.labels, labels)
+        if len(merged) > len(self.labels):
+            grown = np.zeros((len(merged), len(merged)), dtype=self.confusion.dtype)
+            kept = np.searchsorted(merged, self.labels)
+            grown[np.ix_(kept, kept)] = self.confusion
+            self.confusion, self.labels = grown, merged
+        added = np.searchsorted(self.labels, labels)
+        self.confusion[np.ix_(added, added)] += confusion
+
+    def result(self):
+        """Return the metrics of everything added so far."""
+
+        return metrics_from_confusion(self.confusion, self.labels)
+
+
 def confusion_matrix(classifier_output, true_labels):
     """Create a confusion matrix to measure classifier performance.
 
@@ -126,16 +732,8 @@ def confusion_matrix(classifier_output, true_labels):
     """
 
     # TODO: finish this.͏︆͏󠄃͏󠄌͏󠄍͏󠄂͏️͏󠄈͏︀͏︆
-    classifier_output = np.array(classifier_output)
-    true_labels = np.array(true_labels)
-    true_list = true_labels[classifier_output == true_labels]
-    false_list = true_labels[classifier_output != true_labels]
-    TruePos = np.sum(np.array(true_list) == 1).astype(float)
-    TrueNeg = np.sum(np.array(true_list) == 0).astype(float)
-    FalseNeg = np.sum(np.array(false_list) == 1).astype(float)
-    FalsePos = np.sum(np.array(false_list) == 0).astype(float)
-    confusion_matrix = np.array([[TruePos, FalseNeg], [FalsePos, TrueNeg]])
-    return confusion_matrix
+    confusion, _ = confusion_counts(classifier_output, true_labels, [0, 1])
+    return confusion[::-1, ::-1].astype(float)
 
 
 def precision(classifier_output, true_labels):
@@ -146,18 +744,13 @@ def precision(classifier_output, true_labels):
         classifier_output (list(int)): output from classifier.
         true_labels: (list(int): correct classified labels.
     Returns:
-        The precision of the classifier output.
+        The precision of the classifier output; nan when nothing is
+            predicted positive.
     """
 
-    classifier_output = np.array(classifier_output)
-    true_labels = np.array(true_labels)
-    true_list = true_labels[classifier_output == true_labels]
-    false_list = true_labels[classifier_output != true_labels]
-    TruePos = np.sum(np.array(true_list) == 1).astype(float)
-    TrueNeg = np.sum(np.array(true_list) == 0).astype(float)
-    FalseNeg = np.sum(np.array(false_list) == 1).astype(float)
-    FalsePos = np.sum(np.array(false_list) == 0).astype(float)
-    return TruePos/(TruePos+FalsePos)
+    metrics = metrics_from_confusion(
+        *confusion_counts(classifier_output, true_labels, [0, 1]))
+    return metrics['precision'][1]
 
 
 def recall(classifier_output, true_labels):
@@ -168,19 +761,13 @@ def recall(classifier_output, true_labels):
         classifier_output (list(int)): output from classifier.
         true_labels: (list(int): correct classified labels.
     Returns:
-        The recall of the classifier output.
+        The recall of the classifier output; nan when nothing is
+            actually positive.
     """
 
-    classifier_output = np.array(classifier_output)
-    true_labels = np.array(true_labels)
-    true_list = true_labels[classifier_output == true_labels]
-    false_list = true_labels[classifier_output != true_labels]
-    TruePos = np.sum(np.array(true_list) == 1).astype(float)
-    TrueNeg = np.sum(np.array(true_list) == 0).astype(float)
-    FalseNeg = np.sum(np.array(false_list) == 1).astype(float)
-    FalsePos = np.sum(np.array(false_list) == 0).astype(float)
-    confusion_matrix = np.array([[TruePos, FalseNeg], [FalsePos, TrueNeg]])
-    return TruePos/(TruePos+FalseNeg)
+    metrics = metrics_from_confusion(
+        *confusion_counts(classifier_output, true_labels, [0, 1]))
+    return metrics['recall'][1]
 
 def accuracy(classifier_output, true_labels):
     """Get the accuracy of a classifier compared to the correct values.
@@ -193,13 +780,74 @@ def accuracy(classifier_output, true_labels):
         The accuracy of the classifier output.
     """
 
-    classifier_output = np.array(classifier_output)
-    true_labels = np.array(true_labels)
-    correct_classifications = np.sum(np.array(classifier_output) == np.array(true_labels))
+    classifier_output = np.asarray(classifier_output).ravel()
+    true_labels = np.asarray(true_labels).ravel()
+    correct_classifications = np.count_nonzero(classifier_output == true_labels)
     accuracy = correct_classifications/len(true_labels)
     return accuracy
 
 
+def gini_impurity_counts(class_counts):
+    """Compute the gini impurity from class counts.
+    Uses 1 - sum(count ** 2) / total ** 2, so no class vector is needed.
+    Args:
+        class_counts (... x k): counts of each of k classes, for one or
+            many groups of examples.
+    Returns:
+        Gini impurity of every group; empty groups get 0.
+    """
+
+    class_counts = np.asarray(class_counts, dtype=float)
+    total = class_counts.sum(axis=-1)
+    squares = np.einsum('...k,...k->...', class_counts, class_counts)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        gini = np.where(total > 0, 1.0 - squares / (total * total), 0.0)
+    return gini if gini.ndim else float(gini)
+
+
+def gini_gain_counts(previous_counts, current_counts):
+    """Compute the gini gain of a split from class counts in O(classes).
+    Args:
+        previous_counts (k,): class counts of the node being split.
+        current_counts (c x k): class counts of each of its c children.
+    Returns:
+        Floating point number representing the information gain.
+    """
+
+    previous_counts = np.asarray(previous_counts, dtype=float)
+    current_counts = np.asarray(current_counts, dtype=float)
+    total = previous_counts.sum()
+    if total == 0:
+        return 0.0
+    sizes = current_counts.sum(axis=-1)
+    children = np.dot(sizes, gini_impurity_counts(current_counts)) / total
+    return float(gini_impurity_counts(previous_counts) - children)
+
+
+def count_classes(class_vectors):
+    """Count the classes of several class vectors over shared labels.
+    Args:
+        class_vectors (list(list(int))): vectors of classes.
+    Returns:
+        (len(class_vectors) x k) array of counts of k labels: 0 .. the
+            largest label when they are a dense range of integers (see
+            integer_codes()), otherwise every label found, so memory
+            follows the number of classes, not the largest label.
+    """
+
+    sizes = [len(classes) for classes in class_vectors]
+    merged = np.concatenate([np.asarray(classes).ravel()
+                             for classes in class_vectors])
+    codes = integer_codes(merged)
+    if codes is None:
+        _, codes = encode_classes(merged)
+    num_labels = int(codes.max()) + 1 if len(codes) else 1
+    groups = np.repeat(np.arange(len(sizes)), sizes)
+    counts = np.bincount(groups * num_labels + codes,
+                         minlength=len(sizes) * num_labels)
+    return counts.reshape(len(sizes), num_labels)
+
+
 def gini_impurity(class_vector):
     """Compute the gini impurity for a list of classes.
     This is a measure of how often a randomly chosen element
@@ -209,15 +857,12 @@ def gini_impurity(class_vector):
     It reaches its minimum at zero when all elements of class_vector
     belong to the same class.
     Args:
-        class_vector (list(int)): Vector of classes given as 0 or 1.
+        class_vector (list(int)): Vector of classes.
     Returns:
         Floating point number representing the gini impurity.
     """
-    classes = np.array(class_vector)
     if len(class_vector) > 0:
-        p_0 = np.mean(classes.astype(float) == 0)
-        p_1 = np.mean(classes.astype(float) == 1)
-        gini = 1.0 - p_0**2 - p_1**2 + 1e-8
+        gini = gini_impurity_counts(count_classes([class_vector])[0]) + 1e-8
     else:
         gini = 0.0
     return gini
@@ -227,196 +872,2601 @@ def gini_impurity(class_vector):
 
 def gini_gain(previous_classes, current_classes):
     """Compute the gini impurity gain between the previous and current classes.
+    Counts every vector in one pass and defers to gini_gain_counts(); like
+    gini_impurity(), every non-empty vector's impurity carries 1e-8.
     Args:
-        previous_classes (list(int)): Vector of classes given as 0 or 1.
+        previous_classes (list(int)): Vector of classes.
         current_classes (list(list(int): A list of lists where each list has
-            0 and 1 values).
+            class values).
     Returns:
         Floating point number representing the information gain.
     """
-    
-    giniprevious= gini_impurity(previous_classes)
-    bob = len(current_classes)
-    joe = len(previous_classes)
-    gini = giniprevious
-    for i in range(bob):
-        gini = gini - gini_impurity(current_classes[i]) * len(current_classes[i])/joe
 
-    return float(gini)
+    if len(previous_classes) == 0:
+        return 0.0
+    counts = count_classes([previous_classes] + list(current_classes))
+    gini = gini_gain_counts(counts[0], counts[1:])
+    kept = counts[1:].sum() / float(len(previous_classes))
+    return float(gini + 1e-8 * (1.0 - kept))
 
 
-class DecisionTree:
-    """Class for automatic tree-building and classification."""
+def encode_classes(classes):
+    """Number the distinct classes 0 .. k - 1 in sorted order.
+    Args:
+        classes (m x 1): Array of Classes.
+    Returns:
+        Tuple (sorted array of the k classes, array of m class codes).
+    """
 
-    def __init__(self, depth_limit=float('inf')):
-        """Create a decision tree with a set depth limit.
-        Starts with an empty root.
-        Args:
-            depth_limit (float): The maximum depth to build the tree.
-        """
+    class_values, codes = np.unique(np.asarray(classes).ravel(),
+                                    return_inverse=True)
+    return class_values, codes.astype(np.intp)
 
-        self.root = None
-        self.depth_limit = depth_limit
 
-    def fit(self, features, classes):
-        """Build the tree from root using __build_tree__().
+def majority_class(class_vector):
+    """Get the majority class of a list of classes.
+    Ties go to the smallest class.
+    Args:
+        class_vector (list(int)): Vector of classes.
+    Returns:
+        The majority class label.
+    """
+
+    if len(class_vector) == 0:
+        return 0
+    class_values, codes = encode_classes(class_vector)
+    return class_values[np.argmax(np.bincount(codes))]
+
+
+def presort_features(features):
+    """Sort every feature column once for the split search.
+    Args:
+        features (m x n): m examples with n features.
+    Returns:
+        (n x m) array of row indices, row i listing the examples in
+            ascending order of feature i.
+    """
+
+    return np.argsort(features, axis=0, kind='mergesort').T.copy()
+
+
+def split_gini_gains(left_counts, node_counts):
+    """Compute the gini gain of many candidate splits at once.
+    Args:
+        left_counts (... x k): class counts going left for every candidate.
+        node_counts (k,): class counts of the node being split.
+    Returns:
+        Array of gini gains, one per candidate; candidates that leave one
+            side empty get -inf.
+    """
+
+    node_counts = np.asarray(node_counts, dtype=float)
+    left_counts = np.asarray(left_counts, dtype=float)
+    right_counts = node_counts - left_counts
+    num_node = node_counts.sum()
+    num_left = left_counts.sum(axis=-1)
+    num_right = right_counts.sum(axis=-1)
+
+    # n_left * gini_left = n_left - sum(left ** 2) / n_left, so the gain
+    # needs only each side's sum of squared counts.
+    left_squares = np.einsum('...k,...k->...', left_counts, left_counts)
+    right_squares = np.einsum('...k,...k->...', right_counts, right_counts)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        purity = left_squares / num_left + right_squares / num_right
+    gain = purity / num_node - (1.0 - gini_impurity_counts(node_counts))
+    gain[(num_left == 0) | (num_right == 0)] = -np.inf
+    return gain
+
+
+def _count_log_count(counts):
+    """Return c * log2(c) of every count, taking 0 for empty counts."""
+
+    counts = np.asarray(counts, dtype=float)
+    return counts * np.log2(np.where(counts > 0, counts, 1.0))
+
+
+def entropy_counts(class_counts):
+    """Compute the entropy in bits from class counts.
+    Args:
+        class_counts (... x k): counts of each of k classes, for one or
+            many groups of examples.
+    Returns:
+        Entropy of every group; empty groups get 0.
+    """
+
+    class_counts = np.asarray(class_counts, dtype=float)
+    total = class_counts.sum(axis=-1)
+    # total * entropy = total log total - sum(c log c).
+    spread = _count_log_count(total) - _count_log_count(class_counts).sum(axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        entropy = np.where(total > 0, spread / total, 0.0)
+    return entropy if entropy.ndim else float(entropy)
+
+
+def split_entropy_gains(left_counts, node_counts):
+    """Compute the information gain of many candidate splits at once.
+    Args:
+        left_counts (... x k): class counts going left for every candidate.
+        node_counts (k,): class counts of the node being split.
+    Returns:
+        Array of information gains in bits, one per candidate; candidates
+            that leave one side empty get -inf.
+    """
+
+    node_counts = np.asarray(node_counts, dtype=float)
+    left_counts = np.asarray(left_counts, dtype=float)
+    right_counts = node_counts - left_counts
+    num_node = node_counts.sum()
+    num_left = left_counts.sum(axis=-1)
+    num_right = right_counts.sum(axis=-1)
+
+    weighted = (num_left * entropy_counts(left_counts) +
+                num_right * entropy_counts(right_counts))
+    gain = entropy_counts(node_counts) - weighted / num_node
+    gain[(num_left == 0) | (num_right == 0)] = -np.inf
+    return gain
+
+
+def split_variance_gains(left_stats, node_stats):
+    """Compute the variance reduction of many candidate splits at once.
+    Args:
+        left_stats (... x 3): (count, sum, sum of squares) of the targets
+            going left for every candidate.
+        node_stats (3,): the same sums over the node being split.
+    Returns:
+        Array of reductions of the node's target variance, one per
+            candidate; candidates that leave one side empty get -inf.
+    """
+
+    node_stats = np.asarray(node_stats, dtype=float)
+    left_stats = np.asarray(left_stats, dtype=float)
+    right_stats = node_stats - left_stats
+    num_node = node_stats[0]
+    num_left, num_right = left_stats[..., 0], right_stats[..., 0]
+
+    # The squared error of a group is sum_sq - sum ** 2 / n, so only the
+    # sum ** 2 / n terms differ between the node and its children.
+    with np.errstate(divide='ignore', invalid='ignore'):
+        explained = (left_stats[..., 1] ** 2 / num_left +
+                     right_stats[..., 1] ** 2 / num_right)
+    gain = (explained - node_stats[1] ** 2 / num_node) / num_node
+    gain[(num_left == 0) | (num_right == 0)] = -np.inf
+    return gain
+
+
+class ClassCriterion:
+    """Split criterion over class counts.
+    Examples are described by class codes 0 .. k - 1; a node's statistics
+    are its k class counts, and every candidate split of a node is scored
+    from its cumulative left counts in one array operation by gains.
+    """
+
+    def __init__(self, name, gains, impurity):
+        """Name a criterion.
         Args:
-            features (m x n): m examples with n features.
-            classes (m x 1): Array of Classes.
+            name (str): name used by DecisionTree and saved models.
+            gains (func): gains(left_counts, node_counts) of candidates.
+            impurity (func): impurity of class counts.
         """
 
-        self.root = self.__build_tree__(features, classes)
+        self.name = name
+        self.gains = gains
+        self.impurity = impurity
 
-
-    def __build_tree__(self, features, classes, depth=0):
-        """Build tree that automatically finds the decision functions.
+    def statistics(self, classes):
+        """Describe every example for the split search.
         Args:
-            features (m x n): m examples with n features.
             classes (m x 1): Array of Classes.
-            depth (int): depth to build tree to.
         Returns:
-            Root node of decision tree.
+            Tuple (sorted array of the k classes, array of m class codes,
+                number of statistics k).
         """
 
-        if features.shape[0] <= 1:
-            return DecisionNode(None, None, None, classes[0])
-        
-        if(len(set(classes)) == 1):
-            return DecisionNode(None, None, None, classes[0])
+        class_values, codes = encode_classes(classes)
+        return class_values, codes, len(class_values)
 
-        if depth >= self.depth_limit:
-            count_class_0, count_class_1 = np.bincount(classes)
-            if count_class_1 > count_class_0:   
-                return DecisionNode(None, None, None, 1)
-            else:
-                return DecisionNode(None, None, None, 0)
-        
-        bestfeat = None
-        bestgini = 0.0
-        threshold = None
-        finalsplit = None
-            
+    def node_size(self, stats):
+        """Return the number of examples summed into stats."""
 
-            
-        for i in range(features.shape[1]):
-            step = (max(features[:, i]) - min(features[:, i]))/400.0
-            finalsplit = []
-            thresholdfinal = float('-inf')
-            bestginigain = float('-inf')
-            for j in np.arange(min(features[:, i]) + step, max(features[:, i]), step):
-                currthreshold = j
-                splitdis = np.zeros(len(classes))
-                for a in range(len(classes)):
-                    if features[a, i] > currthreshold:
-                        splitdis[a] = 1
-                    else:
-                        splitdis[a] = 0
-        
-                gini = gini_gain(classes, [classes[np.where(splitdis == 0)],
-                                                   classes[np.where(splitdis == 1)]])
-                if gini > bestginigain:
-                    bestginigain = gini
-                    thresholdfinal = currthreshold
-                    finalsplit = splitdis
-            if bestgini < bestginigain:
-                bestgini = bestginigain
-                bestfeat = i
-                threshold = thresholdfinal
-                finalsplit = finalsplit
-            
-                
-        if bestgini == 0.0:
-            return DecisionNode(None, None, None, classes[0])
-        
-        
-        cvleft = classes[features[:, bestfeat] <= threshold]
-        leftfeature = features[features[:, bestfeat] <= threshold]
-        cvright = classes[features[:, bestfeat] > threshold]
-        rightfeature = features[features[:, bestfeat] > threshold]
-        
-        func = lambda features: features[bestfeat] <= threshold
-        
-        currnode = DecisionNode(None, None, func, None)
-        currnode.left = self.__build_tree__(leftfeature, cvleft, depth = depth + 1)
-        currnode.right = self.__build_tree__(rightfeature, cvright, depth = depth + 1)
-        
-        return currnode
+        return np.sum(stats, axis=-1)
 
+    def is_pure(self, stats):
+        """Return whether splitting the node cannot reduce impurity."""
 
+        return np.count_nonzero(stats) < 2
 
+    def leaf_value(self, stats, class_values):
+        """Return the most common class; ties go to the smallest."""
 
+        return class_values[np.argmax(stats)]
 
-    def classify(self, features):
-        """Use the fitted tree to classify a list of example features.
+
+class VarianceCriterion:
+    """Split criterion reducing the variance of regression targets.
+    A node's statistics are the count, sum and sum of squares of its
+    targets, and leaves predict the mean target.
+    """
+
+    name = 'variance'
+
+    def gains(self, left_stats, node_stats):
+        """Return split_variance_gains() of every candidate."""
+
+        return split_variance_gains(left_stats, node_stats)
+
+    def impurity(self, stats):
+        """Return the target variance of (count, sum, sum of squares)."""
+
+        stats = np.asarray(stats, dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = stats[..., 1] / stats[..., 0]
+            variance = stats[..., 2] / stats[..., 0] - mean ** 2
+        return np.where(stats[..., 0] > 0, np.maximum(variance, 0.0), 0.0)
+
+    def statistics(self, classes):
+        """Describe every example for the split search.
         Args:
-            features (m x n): m examples with n features.
-        Return:
-            A list of class labels.
+            classes (m x 1): regression targets.
+        Returns:
+            Tuple (None, (m x 3) array of 1, target and squared target,
+                number of statistics 3).
         """
 
-        predicted_labels = [self.root.decide(features[i]) for i in range(features.shape[0])]
-        return predicted_labels
+        targets = np.asarray(classes, dtype=float).ravel()
+        return None, np.column_stack([np.ones_like(targets), targets,
+                                      targets ** 2]), 3
 
+    def node_size(self, stats):
+        """Return the number of examples summed into stats."""
 
-class RandomForest:
-    """Random forest classification."""
+        return np.asarray(stats)[..., 0]
 
-    def __init__(self, num_trees, depth_limit, example_subsample_rate,
-                 attr_subsample_rate):
-        """Create a random forest.
-         Args:
-             num_trees (int): fixed number of trees.
+    def is_pure(self, stats):
+        """Return whether the targets are constant, up to rounding."""
+
+        return self.impurity(stats) <= 1e-12 * stats[2] / stats[0]
+
+    def leaf_value(self, stats, class_values):
+        """Return the mean target."""
+
+        return stats[1] / stats[0]
+
+
+CRITERIA = {
+    'gini': ClassCriterion('gini', split_gini_gains, gini_impurity_counts),
+    'entropy': ClassCriterion('entropy', split_entropy_gains,
+                              entropy_counts),
+    'variance': VarianceCriterion(),
+}
+
+
+def get_criterion(criterion):
+    """Look up a split criterion.
+    Args:
+        criterion (str or criterion): 'gini', 'entropy', 'variance' or an
+            object with the methods of ClassCriterion.
+    Returns:
+        The criterion object.
+    """
+
+    if not isinstance(criterion, str):
+        return criterion
+    if criterion not in CRITERIA:
+        raise ValueError('Unknown criterion {!r}; expected one of {}'.format(
+            criterion, sorted(CRITERIA)))
+    return CRITERIA[criterion]
+
+
+def sum_statistics(stats, groups, num_groups, num_stats, weights=None):
+    """Sum the statistics of examples within groups with np.bincount.
+    Args:
+        stats (k x 1 or k x s): class codes, summed as one-hot rows of
+            num_stats counts, or rows of num_stats statistics.
+        groups (k x 1): group of every example.
+        num_groups (int): number of groups.
+        num_stats (int): statistics per group.
+        weights (k x 1): times each example is counted. Default is once.
+    Returns:
+        (num_groups x num_stats) array of sums.
+    """
+
+    if stats.ndim == 1:
+        sums = np.bincount(groups * num_stats + stats, weights=weights,
+                           minlength=num_groups * num_stats)
+        return sums.reshape(num_groups, num_stats)
+
+    sums = np.empty((num_groups, num_stats))
+    for j in range(num_stats):
+        column = stats[:, j] if weights is None else stats[:, j] * weights
+        sums[:, j] = np.bincount(groups, weights=column, minlength=num_groups)
+    return sums
+
+
+def limit_leaf_size(gain, left_stats, node_stats, criterion, min_samples_leaf):
+    """Rule out candidate splits leaving a child with too few examples.
+    Args:
+        gain (array): gains of the candidates, changed in place.
+        left_stats (... x s): statistics going left for every candidate.
+        node_stats (s,): statistics of the node being split.
+        criterion (criterion): criterion summing the statistics.
+        min_samples_leaf (int): fewest examples allowed in a child.
+    Returns:
+        The gains, with -inf for ruled out candidates.
+    """
+
+    if min_samples_leaf > 1:
+        num_left = criterion.node_size(left_stats)
+        num_right = criterion.node_size(node_stats) - num_left
+        gain[(num_left < min_samples_leaf) | (num_right < min_samples_leaf)] = -np.inf
+    return gain
+
+
+def best_split(features, classes, sorted_index, num_classes=None,
+               criterion='gini', min_samples_leaf=1):
+    """Find the exact best threshold split of a node.
+    Each feature is swept in sorted order with cumulative statistics, so
+    the gain of every boundary between two distinct values is computed
+    in one pass instead of testing a fixed grid of thresholds.
+    Args:
+        features (m x n): all examples, indexed by sorted_index.
+        classes (m x 1 or m x s): Array of class codes 0 .. num_classes - 1,
+            or rows of statistics from the criterion.
+        sorted_index (n x k): the k rows of the node, row i of the array
+            sorted by feature i.
+        num_classes (int): number of class codes. Default is the largest
+            code plus one, at least 2.
+        criterion (str or criterion): split criterion, see get_criterion().
+        min_samples_leaf (int): fewest examples allowed in a child.
+    Returns:
+        Tuple (feature index, threshold, gain, number of rows going
+            left); the feature index is None when no threshold separates
+            the node.
+    """
+
+    classes = np.asarray(classes)
+    node_classes = classes[sorted_index]
+    if classes.ndim == 1:
+        if num_classes is None:
+            num_classes = max(int(classes.max()) + 1, 2)
+        node_classes = np.eye(num_classes, dtype=np.intp)[node_classes]
+    num_features, num_rows = sorted_index.shape
+    if num_features == 0 or num_rows < 2:
+        return None, None, 0.0, 0
+    values = features[sorted_index, np.arange(num_features)[:, None]]
+    counts = np.cumsum(node_classes, axis=1)
+
+    criterion = get_criterion(criterion)
+    gain = criterion.gains(counts[:, :-1], counts[0, -1])
+    limit_leaf_size(gain, counts[:, :-1], counts[0, -1], criterion,
+                    min_samples_leaf)
+    gain[values[:, :-1] == values[:, 1:]] = -np.inf
+
+    best = np.argmax(gain)
+    bestfeat, position = divmod(best, num_rows - 1)
+    if not np.isfinite(gain[bestfeat, position]):
+        return None, None, 0.0, 0
+
+    low = values[bestfeat, position]
+    high = values[bestfeat, position + 1]
+    threshold = (low + high) / 2.0
+    if threshold >= high:
+        threshold = low
+    return int(bestfeat), threshold, float(gain[bestfeat, position]), position + 1
+
+
+def compute_bin_edges(features, max_bins=255):
+    """Choose the bin edges of every feature column.
+    Columns with at most max_bins distinct values get one bin per value;
+    wider columns are cut at quantiles.
+    Args:
+        features (m x n): m examples with n features.
+        max_bins (int): number of bins per feature, at most 256.
+    Returns:
+        List of n bin edge arrays.
+    """
+
+    if not 2 <= max_bins <= 256:
+        raise ValueError('max_bins must be between 2 and 256')
+
+    features = np.asarray(features)
+    bin_edges = []
+    for i in range(features.shape[1]):
+        column = features[:, i]
+        values = np.unique(column)
+        if len(values) <= max_bins:
+            edges = (values[:-1] + values[1:]) / 2.0
+        else:
+            quantiles = np.linspace(0, 100, max_bins + 1)[1:-1]
+            edges = np.unique(np.percentile(column, quantiles))
+        bin_edges.append(edges)
+    return bin_edges
+
+
+def apply_bins(features, bin_edges):
+    """Quantize examples with bin edges from compute_bin_edges().
+    A value x lands in bin b when bin_edges[b - 1] < x <= bin_edges[b], so
+    a split "bin <= b" is the same as the threshold split
+    "x <= bin_edges[b]".
+    Args:
+        features (m x n): m examples with n features.
+        bin_edges (list): n bin edge arrays.
+    Returns:
+        (m x n) uint8 array of bins.
+    """
+
+    features = np.asarray(features)
+    binned = np.empty(features.shape, dtype=np.uint8)
+    for i, edges in enumerate(bin_edges):
+        binned[:, i] = np.searchsorted(edges, features[:, i], side='left')
+    return binned
+
+
+def bin_features(features, max_bins=255):
+    """Quantize every feature column into a small number of integer bins.
+    Args:
+        features (m x n): m examples with n features.
+        max_bins (int): number of bins per feature, at most 256.
+    Returns:
+        Tuple (binned (m x n) uint8 array, list of n bin edge arrays).
+    """
+
+    bin_edges = compute_bin_edges(features, max_bins)
+    return apply_bins(features, bin_edges), bin_edges
+
+
+HISTOGRAM_CHUNK_CELLS = 1 << 20
+
+
+def class_histogram(binned, classes, rows, columns, num_bins, num_classes=2,
+                    groups=None, num_groups=1):
+    """Count the classes of the given rows in every bin of every column.
+    Columns are counted in chunks of at most HISTOGRAM_CHUNK_CELLS row and
+    column cells, so the temporary bin codes stay small next to the
+    binned data however many rows a node holds.
+    Args:
+        binned (m x n): binned examples from bin_features().
+        classes (m x 1 or m x s): Array of class codes 0 .. num_classes - 1,
+            or rows of num_classes statistics from a criterion.
+        rows (k x 1): rows of the node.
+        columns (c x 1): columns of binned to count.
+        num_bins (int): number of bins per column.
+        num_classes (int): number of class codes or statistics.
+        groups (k x 1): when set, the histogram 0 .. num_groups - 1 each
+            row is counted in, so several nodes are counted in one pass.
+        num_groups (int): number of histograms.
+    Returns:
+        (c x num_bins x num_classes) array of class counts, or
+            (num_groups x c x num_bins x num_classes) when groups is set.
+    """
+
+    columns = np.asarray(columns)
+    counts = np.empty((num_groups, len(columns), num_bins, num_classes))
+    row_stats = classes[rows]
+    group_offsets = 0 if groups is None else groups[:, None]
+
+    step = max(1, HISTOGRAM_CHUNK_CELLS // max(len(rows), 1))
+    for begin in range(0, len(columns), step):
+        chunk = columns[begin:begin + step]
+        num_cells = len(chunk) * num_bins
+        bins = (binned[rows[:, None], chunk] + np.arange(len(chunk)) * num_bins +
+                group_offsets * num_cells)
+        if row_stats.ndim == 1:
+            sums = np.bincount((bins * num_classes + row_stats[:, None]).ravel(),
+                               minlength=num_groups * num_cells * num_classes)
+        else:
+            sums = sum_statistics(np.repeat(row_stats, len(chunk), axis=0),
+                                  bins.ravel(), num_groups * num_cells,
+                                  num_classes)
+        counts[:, begin:begin + len(chunk)] = sums.reshape(
+            num_groups, len(chunk), num_bins, num_classes)
+
+    return counts if groups is not None else counts[0]
+
+
+def best_histogram_split(histogram, criterion='gini', min_samples_leaf=1):
+    """Find the best bin boundary split from a node's class histogram.
+    Args:
+        histogram (c x num_bins x k): class counts from class_histogram().
+        criterion (str or criterion): split criterion, see get_criterion().
+        min_samples_leaf (int): fewest examples allowed in a child.
+    Returns:
+        Tuple (column position, bin, gain); the column position is
+            None when no bin boundary separates the node.
+    """
+
+    if histogram.shape[0] == 0:
+        return None, None, 0.0
+    criterion = get_criterion(criterion)
+    cumulative = np.cumsum(histogram, axis=1)
+    gain = criterion.gains(cumulative[:, :-1], cumulative[0, -1])
+    limit_leaf_size(gain, cumulative[:, :-1], cumulative[0, -1], criterion,
+                    min_samples_leaf)
+
+    best = np.argmax(gain)
+    position, bin_index = divmod(best, gain.shape[1])
+    if not np.isfinite(gain[position, bin_index]):
+        return None, None, 0.0
+    return int(position), int(bin_index), float(gain[position, bin_index])
+
+
+PARALLEL_SEARCH_MIN_CELLS = 1 << 16
+
+SEARCH_CHUNK_CELLS = 1 << 18
+
+
+def search_column_ranges(search, num_columns, num_cells, pool=None,
+                         num_workers=1):
+    """Run a split search over ranges of columns, keep the best.
+    Ranges hold about SEARCH_CHUNK_CELLS gains each, so the temporaries of
+    a search stay bounded however large the node. With a pool, the ranges
+    are searched on its threads; the numpy kernels of the search release
+    the GIL, so they run concurrently. Searches under
+    PARALLEL_SEARCH_MIN_CELLS gains stay in this thread.
+    Args:
+        search (func): search(begin, end) finds the best split of columns
+            begin .. end - 1, returning a tuple whose first entry is the
+            column position relative to begin, None when no column
+            separates the node, and whose third entry is the gain.
+        num_columns (int): number of columns.
+        num_cells (int): number of gains the whole search evaluates.
+        pool (ThreadPoolExecutor): threads to search on. Default is None,
+            searching in this thread.
+        num_workers (int): least number of ranges a pool searches.
+    Returns:
+        The best split, with its column position counted from 0. Ties go
+            to the lowest column, as in a single search.
+    """
+
+    num_ranges = -(-num_cells // SEARCH_CHUNK_CELLS)
+    if pool is not None and num_cells >= PARALLEL_SEARCH_MIN_CELLS:
+        num_ranges = max(num_ranges, num_workers)
+    else:
+        pool = None
+    num_ranges = min(num_ranges, num_columns)
+    if num_ranges <= 1:
+        return search(0, num_columns)
+
+    bounds = np.linspace(0, num_columns, num_ranges + 1).astype(int)
+    searched = (map if pool is None else pool.map)(search, bounds[:-1], bounds[1:])
+    best = None
+    for begin, split in zip(bounds[:-1], searched):
+        if split[0] is not None and (best is None or split[2] > best[2]):
+            best = (int(begin) + split[0],) + tuple(split[1:])
+    return split if best is None else best
+
+
+def search_pool(n_jobs):
+    """Open the thread pool of a feature-parallel split search.
+    Args:
+        n_jobs (int): threads; -1 uses every CPU.
+    Returns:
+        Context manager giving (ThreadPoolExecutor or None, num_workers);
+            the pool is None when n_jobs asks for one thread.
+    """
+
+    num_workers = os.cpu_count() if n_jobs == -1 else n_jobs
+    if num_workers is None or num_workers <= 1:
+        return contextlib.nullcontext((None, 1))
+
+    @contextlib.contextmanager
+    def threads():
+        with ThreadPoolExecutor(num_workers) as pool:
+            yield pool, num_workers
+
+    return threads()
+
+
+def partition_in_place(index, start, end, mask):
+    """Stably move the flagged entries of a segment of an index buffer first.
+    Only index[..., start:end] is rewritten; nothing else is copied, so a
+    tree can be grown on one shared buffer of row indices.
+    Args:
+        index (... x m): buffer of row indices; for a 2D buffer every row
+            must flag the same number of entries.
+        start (int): first position of the segment.
+        end (int): end of the segment.
+        mask (... x k): flags for index[..., start:end], True to go left.
+    Returns:
+        Position in the buffer where the right part begins.
+    """
+
+    segment = index[..., start:end]
+    shape = segment.shape[:-1] + (-1,)
+    left = segment[mask].reshape(shape)
+    right = segment[~mask].reshape(shape)
+    middle = start + left.shape[-1]
+    index[..., start:middle] = left
+    index[..., middle:end] = right
+    return middle
+
+
+class ExactSplitter:
+    """Exact split search over presorted feature columns.
+    All nodes share one (n x m) buffer of presorted row indices; a node is
+    the segment (start, end) of it, and splitting a node reorders only its
+    own segment.
+    """
+
+    def __init__(self, features, classes, criterion='gini', min_samples_leaf=1,
+                 pool=None, num_workers=1):
+        """Sort every feature column once.
+        Args:
+            features (m x n): m examples with n features.
+            classes (m x 1): Array of Classes.
+            criterion (str or criterion): split criterion, see
+                get_criterion().
+            min_samples_leaf (int): fewest examples allowed in a child.
+            pool (ThreadPoolExecutor): when set, large split searches run
+                over ranges of features on its threads.
+            num_workers (int): threads of the pool.
+        """
+
+        self.features = features
+        self.classes = classes
+        self.criterion = get_criterion(criterion)
+        self.min_samples_leaf = min_samples_leaf
+        self.pool = pool
+        self.num_workers = num_workers
+        self.class_values, self.stats, self.num_stats = self.criterion.statistics(classes)
+        self.sorted_index = presort_features(features)
+        self.goes_left = np.zeros(features.shape[0], dtype=bool)
+
+    def root(self):
+        """Return the node holding every example."""
+
+        return 0, self.features.shape[0]
+
+    def node_counts(self, node):
+        """Return the summed statistics of the examples in a node."""
+
+        start, end = node
+        if len(self.sorted_index):
+            rows = self.sorted_index[0, start:end]
+        else:
+            # Without features nothing is ever split: the node is the root.
+            rows = np.arange(start, end)
+        return sum_statistics(self.stats[rows], np.zeros(len(rows), dtype=np.intp),
+                              1, self.num_stats)[0]
+
+    def num_candidates(self, node):
+        """Return the number of thresholds find_split() evaluates."""
+
+        start, end = node
+        return self.features.shape[1] * max(end - start - 1, 0)
+
+    def find_split(self, node):
+        """Find the best split of a node.
+        Args:
+            node (tuple): the node's segment (start, end) of the buffer.
+        Returns:
+            Tuple (feature index, threshold, gain, number of rows going
+                left).
+        """
+
+        start, end = node
+
+        def search(begin, stop):
+            return best_split(self.features[:, begin:stop], self.stats,
+                              self.sorted_index[begin:stop, start:end],
+                              self.num_stats, self.criterion,
+                              self.min_samples_leaf)
+
+        return search_column_ranges(search, self.features.shape[1],
+                                    self.num_candidates(node), self.pool,
+                                    self.num_workers)
+
+    def partition(self, node, split, keep_stats=True):
+        """Split a node into its left and right children.
+        The node is sorted by the chosen feature, so its left rows are a
+        prefix of that order; flagging them and stably partitioning every
+        other order by the flags keeps each order sorted.
+        Args:
+            node (tuple): the node's segment (start, end) of the buffer.
+            split (tuple): result of find_split().
+            keep_stats (bool): unused; sorted orders are always kept.
+        Returns:
+            Tuple (left node, right node).
+        """
+
+        start, end = node
+        feature, _, _, num_left = split
+        segment = self.sorted_index[:, start:end]
+        left_rows = segment[feature, :num_left]
+        self.goes_left[left_rows] = True
+        mask = self.goes_left[segment]
+        self.goes_left[left_rows] = False
+
+        middle = partition_in_place(self.sorted_index, start, end, mask)
+        return (start, middle), (middle, end)
+
+
+    def partition_level(self, nodes, splits, keep_stats=True):
+        """Split several nodes of one tree level; see partition().
+        Returns:
+            List of (left node, right node), one per node.
+        """
+
+        return [self.partition(node, split, keep_stats)
+                for node, split in zip(nodes, splits)]
+
+
+class HistogramSplitter:
+    """Approximate split search over per-bin class histograms.
+    All nodes share one buffer of row indices; a node is a triple
+    (start, end, histogram) naming its segment of the buffer. When a node
+    splits, only the smaller child's histogram is counted from its rows;
+    the larger child's is the parent's histogram minus the smaller one.
+    """
+
+    def __init__(self, binned, bin_edges, classes, rows=None, columns=None,
+                 criterion='gini', min_samples_leaf=1, pool=None, num_workers=1):
+        """Set up a split search over already binned examples.
+        Args:
+            binned (m x n): binned examples from bin_features().
+            bin_edges (list): bin edges from bin_features().
+            classes (m x 1): Array of Classes.
+            rows (k x 1): rows to train on, repeats allowed. Default is all.
+            columns (c x 1): columns to train on. Default is all. Learned
+                nodes index features by position in this list.
+            criterion (str or criterion): split criterion, see
+                get_criterion().
+            min_samples_leaf (int): fewest examples allowed in a child.
+            pool (ThreadPoolExecutor): when set, large split searches run
+                over ranges of columns on its threads.
+            num_workers (int): threads of the pool.
+        """
+
+        if rows is None:
+            rows = np.arange(binned.shape[0])
+        if columns is None:
+            columns = np.arange(binned.shape[1])
+
+        self.binned = binned
+        self.bin_edges = bin_edges
+        self.classes = classes
+        self.criterion = get_criterion(criterion)
+        self.min_samples_leaf = min_samples_leaf
+        self.class_values, self.stats, self.num_stats = self.criterion.statistics(classes)
+        self.rows = np.array(rows, dtype=np.intp)
+        self.columns = np.asarray(columns)
+        self.num_bins = max((len(bin_edges[c]) for c in self.columns),
+                            default=0) + 1
+        self.pool = pool
+        self.num_workers = num_workers
+
+    def histogram(self, rows):
+        """Count the class histogram of the given rows."""
+
+        return class_histogram(self.binned, self.stats, rows, self.columns,
+                               self.num_bins, self.num_stats)
+
+    def root(self):
+        """Return the node holding every training row."""
+
+        return 0, len(self.rows), self.histogram(self.rows)
+
+    def node_counts(self, node):
+        """Return the summed statistics of the examples in a node."""
+
+        start, end, histogram = node
+        if histogram is not None and len(histogram):
+            return histogram[0].sum(axis=0)
+        rows = self.rows[start:end]
+        return sum_statistics(self.stats[rows], np.zeros(len(rows), dtype=np.intp),
+                              1, self.num_stats)[0]
+
+    def num_candidates(self, node):
+        """Return the number of thresholds find_split() evaluates."""
+
+        return len(self.columns) * (self.num_bins - 1)
+
+    def find_split(self, node):
+        """Find the best bin boundary split of a node.
+        Args:
+            node (tuple): the node's segment (start, end) of the row buffer
+                and its class histogram.
+        Returns:
+            Tuple (feature position, threshold, gain, bin).
+        """
+
+        histogram = node[2]
+
+        def search(begin, stop):
+            return best_histogram_split(histogram[begin:stop], self.criterion,
+                                        self.min_samples_leaf)
+
+        position, bin_index, gain = search_column_ranges(
+            search, len(self.columns), histogram.size, self.pool,
+            self.num_workers)
+        if position is None:
+            return None, None, 0.0, None
+
+        threshold = self.bin_edges[self.columns[position]][bin_index]
+        return position, threshold, gain, bin_index
+
+    def partition(self, node, split, keep_stats=True):
+        """Split a node into its left and right children.
+        Args:
+            node (tuple): the node's segment (start, end) of the row buffer
+                and its class histogram.
+            split (tuple): result of find_split().
+            keep_stats (bool): whether the children will be searched for
+                splits. When False their histograms are not built.
+        Returns:
+            Tuple (left node, right node).
+        """
+
+        return self.partition_level([node], [split], keep_stats)[0]
+
+    def partition_level(self, nodes, splits, keep_stats=True):
+        """Split several nodes of one tree level together.
+        The smaller children of all the nodes are counted in a single
+        histogram pass; see partition().
+        Args:
+            nodes (list(tuple)): the nodes to split.
+            splits (list(tuple)): result of find_split() for every node.
+            keep_stats (bool): whether the children will be searched for
+                splits. When False their histograms are not built.
+        Returns:
+            List of (left node, right node), one per node.
+        """
+
+        bounds = []
+        for (start, end, _), (position, _, _, bin_index) in zip(nodes, splits):
+            mask = self.binned[self.rows[start:end], self.columns[position]] <= bin_index
+            bounds.append((start, partition_in_place(self.rows, start, end, mask),
+                           end))
+        if not keep_stats:
+            return [((start, middle, None), (middle, end, None))
+                    for start, middle, end in bounds]
+
+        left_smaller = [middle - start <= end - middle
+                        for start, middle, end in bounds]
+        segments = [(start, middle) if smaller else (middle, end)
+                    for (start, middle, end), smaller in zip(bounds, left_smaller)]
+        rows = np.concatenate([self.rows[begin:stop] for begin, stop in segments])
+        groups = np.repeat(np.arange(len(nodes)),
+                           [stop - begin for begin, stop in segments])
+        counted = class_histogram(self.binned, self.stats, rows, self.columns,
+                                  self.num_bins, self.num_stats, groups, len(nodes))
+
+        children = []
+        for (start, middle, end), (_, _, histogram), smaller, small in zip(
+                bounds, nodes, left_smaller, counted):
+            if smaller:
+                left_histogram, right_histogram = small, histogram - small
+            else:
+                left_histogram, right_histogram = histogram - small, small
+            children.append(((start, middle, left_histogram),
+                             (middle, end, right_histogram)))
+        return children
+
+
+class SparseSplitter:
+    """Split search on a binary CSRMatrix without densifying it.
+    Every split asks whether one feature is present: examples without it
+    (value 0 <= 0.5) go left. A node's class counts per present feature
+    come from one bincount over the stored entries of its rows.
+    """
+
+    def __init__(self, matrix, classes, rows=None, columns=None,
+                 criterion='gini', min_samples_leaf=1):
+        """Set up a split search over a sparse matrix.
+        Args:
+            matrix (CSRMatrix): binary examples.
+            classes (m x 1): Array of Classes.
+            rows (k x 1): rows to train on, repeats allowed. Default is all.
+            columns (c x 1): columns to train on. Default is all. Learned
+                nodes index features by position in this list.
+            criterion (str or criterion): split criterion, see
+                get_criterion().
+            min_samples_leaf (int): fewest examples allowed in a child.
+        """
+
+        if rows is None:
+            rows = np.arange(matrix.shape[0])
+        if columns is None:
+            columns = np.arange(matrix.shape[1])
+
+        self.matrix = matrix
+        self.classes = classes
+        self.criterion = get_criterion(criterion)
+        self.min_samples_leaf = min_samples_leaf
+        self.class_values, self.stats, self.num_stats = self.criterion.statistics(classes)
+        self.rows = np.array(rows, dtype=np.intp)
+        self.columns = np.asarray(columns)
+
+    def root(self):
+        """Return the node holding every training row."""
+
+        return 0, len(self.rows)
+
+    def node_counts(self, node):
+        """Return the summed statistics of the examples in a node."""
+
+        start, end = node
+        rows = self.rows[start:end]
+        return sum_statistics(self.stats[rows], np.zeros(len(rows), dtype=np.intp),
+                              1, self.num_stats)[0]
+
+    def num_candidates(self, node):
+        """Return the number of thresholds find_split() evaluates."""
+
+        return len(self.columns)
+
+    def find_split(self, node):
+        """Find the best present/absent split of a node.
+        Args:
+            node (tuple): the node's segment (start, end) of the row buffer.
+        Returns:
+            Tuple (feature position, threshold, gain, None).
+        """
+
+        start, end = node
+        rows = self.rows[start:end]
+        stats = self.stats[rows]
+        entry_rows, entry_columns = self.matrix.row_entries(rows)
+        present = sum_statistics(stats[entry_rows], entry_columns,
+                                 self.matrix.shape[1], self.num_stats)
+        node_counts = self.node_counts(node)
+
+        left_counts = node_counts - present[self.columns]
+        gain = self.criterion.gains(left_counts, node_counts)
+        limit_leaf_size(gain, left_counts, node_counts, self.criterion,
+                        self.min_samples_leaf)
+        if not len(gain):
+            return None, None, 0.0, None
+        position = int(np.argmax(gain))
+        if not np.isfinite(gain[position]):
+            return None, None, 0.0, None
+        return position, 0.5, float(gain[position]), None
+
+    def partition(self, node, split, keep_stats=True):
+        """Split a node into its left and right children.
+        Args:
+            node (tuple): the node's segment (start, end) of the row buffer.
+            split (tuple): result of find_split().
+            keep_stats (bool): unused; sparse nodes keep no statistics.
+        Returns:
+            Tuple (left node, right node).
+        """
+
+        start, end = node
+        rows = self.rows[start:end]
+        column = np.full(len(rows), self.columns[split[0]])
+        mask = self.matrix.lookup(rows, column) <= split[1]
+        middle = partition_in_place(self.rows, start, end, mask)
+        return (start, middle), (middle, end)
+
+    def partition_level(self, nodes, splits, keep_stats=True):
+        """Split several nodes of one tree level; see partition().
+        Returns:
+            List of (left node, right node), one per node.
+        """
+
+        return [self.partition(node, split, keep_stats)
+                for node, split in zip(nodes, splits)]
+
+
+def preorder_nodes(root):
+    """Yield a tree of DecisionNodes in the order of FlatTree.from_node()."""
+
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        yield node
+        if node.class_label is None:
+            stack.append(node.right)
+            stack.append(node.left)
+
+
+class FlatTree:
+    """A fitted tree stored as parallel arrays with one entry per node.
+    Node 0 is the root. Internal node i sends an example to left[i] when
+    example[feature[i]] <= threshold[i] and to right[i] otherwise. Leaves
+    have feature -1, children -1 and their class label in value.
+    """
+
+    def __init__(self, feature, threshold, left, right, value):
+        """Wrap the node arrays of a tree.
+        Args:
+            feature (k x 1): feature index tested by each node.
+            threshold (k x 1): threshold of each node.
+            left (k x 1): left child of each node.
+            right (k x 1): right child of each node.
+            value (k x 1): class label of each leaf.
+        """
+
+        self.feature = np.asarray(feature, dtype=np.intp)
+        self.threshold = np.asarray(threshold, dtype=float)
+        self.left = np.asarray(left, dtype=np.intp)
+        self.right = np.asarray(right, dtype=np.intp)
+        self.value = np.asarray(value)
+
+    @classmethod
+    def from_node(cls, root):
+        """Flatten a tree of DecisionNodes in preorder.
+        Args:
+            root (DecisionNode): root of a tree whose internal nodes all
+                hold a '<=' Split.
+        Returns:
+            FlatTree.
+        """
+
+        records = []
+        stack = [(root, None, None)]
+        while stack:
+            node, parent, side = stack.pop()
+            node_id = len(records)
+            if parent is not None:
+                records[parent][side] = node_id
+            if node.class_label is not None:
+                records.append([-1, 0.0, -1, -1, node.class_label])
+                continue
+
+            split = node.split
+            if split is None or split.operator != '<=':
+                raise ValueError('Only trees of <= Splits can be flattened')
+            records.append([split.feature, split.threshold, -1, -1, 0])
+            stack.append((node.right, node_id, 3))
+            stack.append((node.left, node_id, 2))
+
+        return cls(*zip(*records))
+
+    def remap_features(self, columns):
+        """Return a copy testing columns[feature] instead of feature.
+        A tree trained on a column subset can then read the full examples
+        directly, without copying that subset out of them first.
+        Args:
+            columns (c x 1): original column of each feature of the tree.
+        Returns:
+            FlatTree.
+        """
+
+        columns = np.asarray(columns, dtype=np.intp)
+        feature = np.full(len(self.feature), -1, dtype=np.intp)
+        internal = self.feature >= 0
+        feature[internal] = columns[self.feature[internal]]
+        return FlatTree(feature, self.threshold, self.left, self.right,
+                        self.value)
+
+    def to_node(self):
+        """Rebuild the tree of DecisionNodes with <= Splits.
+        Returns:
+            Root DecisionNode.
+        """
+
+        nodes = []
+        for i in range(len(self.feature)):
+            if self.feature[i] < 0:
+                nodes.append(DecisionNode(None, None, None, self.value[i]))
+            else:
+                split = Split(int(self.feature[i]), float(self.threshold[i]))
+                nodes.append(DecisionNode(None, None, split, None))
+        for i, node in enumerate(nodes):
+            if self.feature[i] >= 0:
+                node.left = nodes[self.left[i]]
+                node.right = nodes[self.right[i]]
+        return nodes[0]
+
+    def apply(self, features, block_size=65536):
+        """Find the leaf every example reaches, one tree level per step.
+        Every example of a block moves down one level per step through
+        vectorized gathers; examples that reach a leaf drop out.
+        Args:
+            features (m x n): m examples with n features, dense or a
+                CSRMatrix.
+            block_size (int): examples sent down the tree together.
+        Returns:
+            Array of m leaf node indices.
+        """
+
+        features = as_examples(features)
+        sparse = isinstance(features, CSRMatrix)
+        leaves = np.zeros(features.shape[0], dtype=np.intp)
+        if self.feature[0] < 0:
+            return leaves
+        for begin in range(0, features.shape[0], block_size):
+            block = features[begin:begin + block_size]
+            node = leaves[begin:begin + block_size]
+            active = np.arange(block.shape[0])
+            while len(active):
+                current = node[active]
+                if sparse:
+                    values = block.lookup(active, self.feature[current])
+                else:
+                    values = block[active, self.feature[current]]
+                go_left = values <= self.threshold[current]
+                current = np.where(go_left, self.left[current],
+                                   self.right[current])
+                node[active] = current
+                active = active[self.feature[current] >= 0]
+        return leaves
+
+    def predict_batch(self, features, block_size=65536):
+        """Classify many examples at once with vectorized tree walks.
+        Args:
+            features (m x n): m examples with n features, dense or a
+                CSRMatrix.
+            block_size (int): examples sent down the tree together.
+        Returns:
+            Array of m class labels.
+        """
+
+        return self.value[self.apply(features, block_size)]
+
+
+def subtree_statistics(flat, leaf_stats):
+    """Sum leaf statistics up to every node of a flat tree.
+    Children follow their parent in a flat tree, so one backward pass
+    reaches every node after its children.
+    Args:
+        flat (FlatTree): the tree.
+        leaf_stats (k x s): statistics of each node's own examples, zero
+            for internal nodes.
+    Returns:
+        (k x s) array of the statistics of every node's examples.
+    """
+
+    node_stats = np.array(leaf_stats, dtype=float)
+    for i in range(len(flat.feature) - 1, -1, -1):
+        if flat.feature[i] >= 0:
+            node_stats[i] = node_stats[flat.left[i]] + node_stats[flat.right[i]]
+    return node_stats
+
+
+def prune_cost_complexity(flat, node_stats, ccp_alpha, criterion='gini',
+                          class_values=None):
+    """Minimal cost-complexity pruning of a flat tree.
+    A subtree's cost is the impurity of its leaves weighted by their share
+    of the examples. The weakest links, the internal nodes whose subtree
+    lowers the cost least per extra leaf, are made leaves one round at a
+    time while that rate is at most ccp_alpha.
+    Args:
+        flat (FlatTree): the tree.
+        node_stats (k x s): statistics of every node, e.g. from
+            subtree_statistics().
+        ccp_alpha (float): complexity cost of a leaf.
+        criterion (str or criterion): criterion of the statistics.
+        class_values (k x 1): classes of the statistics, to label new
+            leaves.
+    Returns:
+        Tuple (pruned FlatTree, its node statistics).
+    """
+
+    criterion = get_criterion(criterion)
+    node_stats = np.asarray(node_stats, dtype=float)
+    sizes = criterion.node_size(node_stats)
+    cost = criterion.impurity(node_stats) * sizes / sizes[0]
+    internal = flat.feature >= 0
+    num_nodes = len(flat.feature)
+
+    parents = np.flatnonzero(internal)
+    parent = np.full(num_nodes, -1, dtype=np.intp)
+    parent[flat.left[parents]] = parents
+    parent[flat.right[parents]] = parents
+    subtree_cost = cost.copy()
+    leaves = np.ones(num_nodes)
+    for i in parents[::-1]:
+        left, right = flat.left[i], flat.right[i]
+        subtree_cost[i] = subtree_cost[left] + subtree_cost[right]
+        leaves[i] = leaves[left] + leaves[right]
+
+    # Each round prunes the weakest links, then updates only the subtree
+    # cost and leaf count of their ancestors.
+    while internal[0]:
+        links = np.flatnonzero(internal)
+        rate = (cost[links] - subtree_cost[links]) / (leaves[links] - 1)
+        weakest = rate.min()
+        if weakest > ccp_alpha:
+            break
+        for node in links[rate <= weakest + 1e-12]:
+            if not internal[node]:
+                continue
+            cost_change = cost[node] - subtree_cost[node]
+            leaf_change = leaves[node] - 1
+            subtree_cost[node], leaves[node] = cost[node], 1
+            stack = [node]
+            while stack:
+                i = stack.pop()
+                if internal[i]:
+                    internal[i] = False
+                    stack.extend((flat.left[i], flat.right[i]))
+            ancestor = parent[node]
+            while ancestor >= 0:
+                subtree_cost[ancestor] += cost_change
+                leaves[ancestor] -= leaf_change
+                ancestor = parent[ancestor]
+
+    records, kept = [], []
+    stack = [(0, None, None)]
+    while stack:
+        node, parent, side = stack.pop()
+        node_id = len(records)
+        if parent is not None:
+            records[parent][side] = node_id
+        kept.append(node)
+        if not internal[node]:
+            value = flat.value[node]
+            if flat.feature[node] >= 0:
+                value = criterion.leaf_value(node_stats[node], class_values)
+            records.append([-1, 0.0, -1, -1, value])
+            continue
+        records.append([flat.feature[node], flat.threshold[node], -1, -1,
+                        flat.value[node]])
+        stack.append((flat.right[node], node_id, 3))
+        stack.append((flat.left[node], node_id, 2))
+
+    return FlatTree(*zip(*records)), node_stats[kept]
+
+
+def iter_dataset(data_file_path, block_rows=65536):
+    """Read a binary dataset from save_dataset() as a stream of row blocks.
+    Args:
+        data_file_path (str): path to data file.
+        block_rows (int): examples per block.
+    Yields:
+        features, classes blocks as numpy arrays.
+    """
+
+    features, classes = load_dataset(data_file_path)
+    for begin in range(0, len(classes), block_rows):
+        yield (np.array(features[begin:begin + block_rows]),
+               np.array(classes[begin:begin + block_rows]))
+
+
+def sample_blocks(blocks, sample_rows=100000, seed=0):
+    """Draw a uniform random sample of examples from a stream of blocks.
+    Every example gets a random key and the sample keeps the smallest
+    keys seen so far, so at most sample_rows examples are ever held. The
+    same pass collects every class of the stream.
+    Args:
+        blocks (iterable): (features, classes) blocks.
+        sample_rows (int): size of the sample.
+        seed (int): seed of the random keys.
+    Returns:
+        Tuple ((k x n) array of sampled examples, sorted array of the
+            classes seen).
+    """
+
+    rng = np.random.default_rng(seed)
+    sample, keys = None, None
+    class_values = None
+    for features, classes in blocks:
+        features = np.asarray(features)
+        classes = np.unique(np.asarray(classes))
+        if class_values is not None:
+            classes = np.union1d(class_values, classes)
+        class_values = classes
+        block_keys = rng.random(len(features))
+        if sample is None:
+            sample, keys = features, block_keys
+        else:
+            sample = np.concatenate([sample, features])
+            keys = np.concatenate([keys, block_keys])
+        if len(keys) > sample_rows:
+            keep = np.argpartition(keys, sample_rows)[:sample_rows]
+            sample, keys = sample[keep], keys[keep]
+    return sample, class_values
+
+
+class StreamingTreeGrower:
+    """Level-wise growth of one tree from passes over streamed row blocks.
+    The tree is kept as flat node lists. During a pass every example is
+    routed to the open node it has reached and added to that node's
+    per-bin class histogram; after the pass every open node is either
+    split, opening two children for the next pass, or made a leaf.
+    """
+
+    def __init__(self, bin_edges, depth_limit, class_values=(0, 1),
+                 columns=None, subsample_rate=None, seed=None,
+                 criterion='gini', min_samples_split=2, min_samples_leaf=1,
+                 min_impurity_decrease=0.0):
+        """Start a tree with an open root.
+        Args:
+            bin_edges (list): bin edges of every column.
+            depth_limit (float): The maximum depth to build the tree.
+            class_values (k x 1): the classes, in the order of the class
+                codes passed to accumulate().
+            columns (c x 1): columns to train on. Default is all. Learned
+                nodes index features by position in this list.
+            subsample_rate (float): when set, each example is counted
+                Poisson(subsample_rate) times, the streaming form of a
+                bootstrap sample. Default is None, counting each once.
+            seed (np.random.SeedSequence): stream of the Poisson counts.
+            criterion (str): 'gini' or 'entropy'.
+            min_samples_split (int): fewest (weighted) examples a node needs
+                to be split.
+            min_samples_leaf (int): fewest examples allowed in a child.
+            min_impurity_decrease (float): least impurity decrease, weighted
+                by the node's share of the examples, a split must make.
+        """
+
+        self.criterion = get_criterion(criterion)
+        if not isinstance(self.criterion, ClassCriterion):
+            raise ValueError('Streamed trees need a class criterion')
+        if columns is None:
+            columns = np.arange(len(bin_edges))
+        self.columns = np.asarray(columns)
+        self.bin_edges = bin_edges
+        self.num_bins = max((len(bin_edges[c]) for c in self.columns),
+                            default=0) + 1
+        self.depth_limit = depth_limit
+        self.class_values = np.asarray(class_values)
+        self.subsample_rate = subsample_rate
+        self.seed = seed
+        self.min_samples_split = min_samples_split
+        self.min_samples_leaf = min_samples_leaf
+        self.min_impurity_decrease = min_impurity_decrease
+        self.num_samples = None
+
+        self.feature, self.threshold = [-1], [0.0]
+        self.left, self.right = [-1], [-1]
+        self.value = [self.class_values[0]]
+        self.depth = [0]
+        self.open = [0]
+
+    def flat(self):
+        """Return the tree grown so far as a FlatTree."""
+
+        return FlatTree(self.feature, self.threshold, self.left, self.right,
+                        self.value)
+
+    def start_pass(self):
+        """Reset the statistics of the open nodes before a pass."""
+
+        self.routing = self.flat().remap_features(self.columns)
+        self.open_position = np.full(len(self.feature), -1, dtype=np.intp)
+        self.open_position[self.open] = np.arange(len(self.open))
+        self.splittable = np.array([self.depth[i] < self.depth_limit
+                                    for i in self.open])
+        num_classes = len(self.class_values)
+        self.class_counts = np.zeros((len(self.open), num_classes))
+        self.histograms = np.zeros((int(self.splittable.sum()),
+                                    len(self.columns), self.num_bins,
+                                    num_classes))
+        self.histogram_position = np.cumsum(self.splittable) - 1
+
+    def accumulate(self, features, binned, labels, block_index):
+        """Add one block of examples to the open nodes' statistics.
+        Args:
+            features (k x n): raw examples of the block.
+            binned (k x n): the same examples from apply_bins().
+            labels (k x 1): class codes of the block.
+            block_index (int): position of the block in the stream.
+        """
+
+        if self.subsample_rate is None:
+            weights = np.ones(len(labels))
+        else:
+            seed = np.random.SeedSequence(self.seed.entropy,
+                                          spawn_key=self.seed.spawn_key + (block_index,))
+            weights = np.random.default_rng(seed).poisson(
+                self.subsample_rate, len(labels)).astype(float)
+
+        position = self.open_position[self.routing.apply(features)]
+        rows = np.flatnonzero((position >= 0) & (weights > 0))
+        position, labels, weights = position[rows], labels[rows], weights[rows]
+
+        num_classes = len(self.class_values)
+        self.class_counts += np.bincount(
+            position * num_classes + labels, weights=weights,
+            minlength=self.class_counts.size).reshape(self.class_counts.shape)
+
+        keep = self.splittable[position]
+        rows, labels, weights = rows[keep], labels[keep], weights[keep]
+        position = self.histogram_position[position[keep]]
+        num_columns = len(self.columns)
+        codes = (((position[:, None] * num_columns + np.arange(num_columns)) *
+                  self.num_bins + binned[rows[:, None], self.columns]) *
+                 num_classes + labels[:, None])
+        # Sum over the cells this block touches only; a bincount with
+        # minlength would allocate a copy of every open node's histogram.
+        touched, inverse = np.unique(codes.ravel(), return_inverse=True)
+        sums = np.bincount(inverse, weights=np.repeat(weights, num_columns),
+                           minlength=len(touched))
+        self.histograms.reshape(-1)[touched] += sums
+
+    def expand(self):
+        """Split or close every open node after a pass."""
+
+        opened = []
+        for i, node in enumerate(self.open):
+            counts = self.class_counts[i]
+            size = counts.sum()
+            if self.num_samples is None:
+                self.num_samples = size
+            self.value[node] = self.class_values[np.argmax(counts)]
+            if (not self.splittable[i] or np.count_nonzero(counts) < 2 or
+                    size < max(self.min_samples_split, 2)):
+                continue
+
+            histogram = self.histograms[self.histogram_position[i]]
+            position, bin_index, gain = best_histogram_split(
+                histogram, self.criterion, self.min_samples_leaf)
+            if (position is None or gain <= 0.0 or
+                    gain * size / self.num_samples < self.min_impurity_decrease):
+                continue
+
+            self.feature[node] = position
+            self.threshold[node] = self.bin_edges[self.columns[position]][bin_index]
+            self.left[node], self.right[node] = len(self.feature), len(self.feature) + 1
+            for _ in range(2):
+                self.feature.append(-1)
+                self.threshold.append(0.0)
+                self.left.append(-1)
+                self.right.append(-1)
+                self.value.append(self.class_values[0])
+                self.depth.append(self.depth[node] + 1)
+                opened.append(len(self.feature) - 1)
+        self.open = opened
+
+
+def grow_from_blocks(growers, blocks, bin_edges, class_values=(0, 1)):
+    """Grow trees level by level, one pass over the blocks per level.
+    Args:
+        growers (list(StreamingTreeGrower)): trees grown together, so one
+            pass serves all of them.
+        blocks (func): returns a fresh iterator of (features, classes)
+            blocks each time it is called.
+        bin_edges (list): bin edges of every column.
+        class_values (k x 1): sorted classes of the stream.
+    """
+
+    class_values = np.asarray(class_values)
+
+    while any(grower.open for grower in growers):
+        active = [grower for grower in growers if grower.open]
+        for grower in active:
+            grower.start_pass()
+        for block_index, (features, classes) in enumerate(blocks()):
+            features = np.asarray(features)
+            binned = apply_bins(features, bin_edges)
+            labels = encode_labels(np.asarray(classes).ravel(), class_values)
+            for grower in active:
+                grower.accumulate(features, binned, labels, block_index)
+        for grower in active:
+            grower.expand()
+
+
+FLAT_TREE_FIELDS = ('feature', 'threshold', 'left', 'right', 'value')
+
+
+def flat_tree_arrays(flat_trees):
+    """Concatenate the node arrays of several flat trees for saving.
+    Child indices stay relative to their own tree.
+    Args:
+        flat_trees (list(FlatTree)): trees to store.
+    Returns:
+        dict of array name -> array, with tree_offsets marking where each
+            tree's nodes start.
+    """
+
+    arrays = {name: np.concatenate([getattr(flat, name) for flat in flat_trees])
+              for name in FLAT_TREE_FIELDS}
+    sizes = [len(flat.feature) for flat in flat_trees]
+    arrays['tree_offsets'] = np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64)
+    return arrays
+
+
+def flat_trees_from_arrays(arrays):
+    """Split arrays from flat_tree_arrays() back into flat trees.
+    Every tree is a view of the arrays, so nothing is copied.
+    Args:
+        arrays (dict): array name -> array.
+    Returns:
+        List of FlatTree.
+    """
+
+    offsets = arrays['tree_offsets']
+    return [FlatTree(*[arrays[name][offsets[i]:offsets[i + 1]]
+                       for name in FLAT_TREE_FIELDS])
+            for i in range(len(offsets) - 1)]
+
+
+NODE_STAT_FIELDS = ('tree', 'depth', 'samples', 'candidates', 'split',
+                    'search_seconds', 'partition_seconds', 'bytes')
+
+
+class TrainingStats:
+    """Per-node record of where tree growth spends its time.
+    Pass one to DecisionTree or RandomForest as stats. Every grown node
+    adds a record of NODE_STAT_FIELDS: its tree, depth and number of
+    samples, the split thresholds evaluated, whether it was split, the
+    seconds spent in split search and in partitioning, and, when
+    trace_memory is set, the peak bytes allocated by those two steps.
+    """
+
+    def __init__(self, callback=None, trace_memory=False):
+        """Start with no records.
+        Args:
+            callback (func): called with a dict of every new record.
+            trace_memory (bool): measure allocations with tracemalloc,
+                starting it if needed until the tree ends. This slows
+                training down.
+        """
+
+        self.callback = callback
+        self.trace_memory = trace_memory
+        self.records = []
+        self.num_trees = 0
+        self.started_tracing = False
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['callback'] = None
+        return state
+
+    def measure(self, func, *args):
+        """Call func(*args), timing it and tracing its allocations.
+        Returns:
+            Tuple (result, (seconds, peak bytes allocated)).
+        """
+
+        allocated = 0
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self.started_tracing = True
+            if hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+            else:
+                # Python 3.8 has no reset_peak(); clearing the traces
+                # resets the peak along with them.
+                tracemalloc.clear_traces()
+            before = tracemalloc.get_traced_memory()[0]
+        began = time.perf_counter()
+        result = func(*args)
+        seconds = time.perf_counter() - began
+        if self.trace_memory:
+            allocated = tracemalloc.get_traced_memory()[1] - before
+        return result, (seconds, allocated)
+
+    def record(self, depth, samples, candidates, split, searched=None,
+               partitioned=None):
+        """Add the record of one node of the current tree.
+        Args:
+            depth (int): depth of the node.
+            samples (int): number of examples in the node.
+            candidates (int): split thresholds evaluated.
+            split (bool): whether the node was split.
+            searched (tuple): measure() of the split search, if run.
+            partitioned (tuple): measure() of the partition, if run.
+        """
+
+        searched = searched or (0.0, 0)
+        partitioned = partitioned or (0.0, 0)
+        record = (self.num_trees, depth, int(samples), candidates, split,
+                  searched[0], partitioned[0], searched[1] + partitioned[1])
+        self.records.append(record)
+        if self.callback is not None:
+            self.callback(dict(zip(NODE_STAT_FIELDS, record)))
+
+    def end_tree(self):
+        """Number the records that follow as the next tree."""
+
+        self.num_trees += 1
+        self.stop_tracing()
+
+    def stop_tracing(self):
+        """Stop tracemalloc if measure() started it."""
+
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+
+    def merge(self, other):
+        """Add the records of another TrainingStats as further trees.
+        Forests grow each tree with its own stats, possibly in another
+        process, and merge them in order.
+        """
+
+        first = self.num_trees
+        for record in other.records:
+            record = (first + record[0],) + record[1:]
+            self.records.append(record)
+            if self.callback is not None:
+                self.callback(dict(zip(NODE_STAT_FIELDS, record)))
+        self.num_trees += other.num_trees
+
+    def as_arrays(self):
+        """Return the records as a dict of field name -> array."""
+
+        columns = list(zip(*self.records)) or [()] * len(NODE_STAT_FIELDS)
+        return {name: np.array(column)
+                for name, column in zip(NODE_STAT_FIELDS, columns)}
+
+    def summary(self):
+        """Aggregate the records over all trees, in total and by depth.
+        Returns:
+            dict of totals, with by_depth mapping each depth to the same
+                totals over its nodes.
+        """
+
+        arrays = self.as_arrays()
+
+        def totals(rows):
+            return {'nodes': int(np.count_nonzero(rows)),
+                    'splits': int(np.count_nonzero(arrays['split'][rows])),
+                    'samples': int(np.sum(arrays['samples'][rows])),
+                    'candidates': int(np.sum(arrays['candidates'][rows])),
+                    'search_seconds': float(np.sum(arrays['search_seconds'][rows])),
+                    'partition_seconds': float(np.sum(arrays['partition_seconds'][rows])),
+                    'bytes': int(np.sum(arrays['bytes'][rows]))}
+
+        depth = arrays['depth'].astype(np.intp)
+        summary = totals(np.ones(len(depth), dtype=bool))
+        summary['trees'] = self.num_trees
+        summary['by_depth'] = {int(d): totals(depth == d) for d in np.unique(depth)}
+        return summary
+
+
+class _NoStats:
+    """Stand-in for TrainingStats when instrumentation is off."""
+
+    def measure(self, func, *args):
+        return func(*args), None
+
+    def record(self, *args):
+        pass
+
+
+_NO_STATS = _NoStats()
+
+
+TREE_PARAMS = ('depth_limit', 'max_bins', 'criterion', 'min_samples_split',
+               'min_samples_leaf', 'min_impurity_decrease', 'max_leaf_nodes',
+               'ccp_alpha', 'growth')
+
+GROWTH_POLICIES = ('depth', 'breadth', 'best')
+
+
+class DecisionTree:
+    """Class for automatic tree-building and classification."""
+
+    def __init__(self, depth_limit=float('inf'), max_bins=None,
+                 criterion='gini', stats=None, min_samples_split=2,
+                 min_samples_leaf=1, min_impurity_decrease=0.0,
+                 max_leaf_nodes=None, ccp_alpha=0.0, growth=None, n_jobs=1):
+        """Create a decision tree with a set depth limit.
+        Starts with an empty root.
+        Args:
+            depth_limit (float): The maximum depth to build the tree.
+            max_bins (int): When set, quantize every feature into at most
+                this many bins and search splits on class histograms.
+                Default is None, an exact search over every threshold.
+            criterion (str): 'gini' or 'entropy' to classify, or
+                'variance' to fit regression targets with mean leaves.
+            stats (TrainingStats): when set, records every node grown by
+                fit(), fit_binned() and fit_sparse(). Default is None,
+                recording nothing.
+            min_samples_split (int): fewest examples a node needs to be
+                split.
+            min_samples_leaf (int): fewest examples allowed in a child;
+                splits leaving fewer are not considered.
+            min_impurity_decrease (float): least impurity decrease, weighted
+                by the node's share of the examples, a split must make.
+            max_leaf_nodes (int): when set, stop splitting once the tree
+                has this many leaves.
+            ccp_alpha (float): when positive, prune the fitted tree with
+                prune(); the complexity cost of each leaf.
+            growth (str): order nodes are split in, one of GROWTH_POLICIES:
+                'depth' first, 'breadth' first, a whole level at a time,
+                or 'best' first by weighted impurity decrease. Default is
+                'best' when max_leaf_nodes is set and 'depth' otherwise.
+            n_jobs (int): threads searching ranges of features for each
+                node's split in parallel; -1 uses every CPU. Default is 1.
+                Sparse split search stays in one thread.
+        """
+
+        if growth is not None and growth not in GROWTH_POLICIES:
+            raise ValueError('Unknown growth policy {!r}; use one of {}'.format(
+                growth, ', '.join(GROWTH_POLICIES)))
+
+        self._root = None
+        self.flat = None
+        self.node_stats = None
+        self.class_values = None
+        self.depth_limit = depth_limit
+        self.max_bins = max_bins
+        self.criterion = criterion
+        self.stats = stats
+        self.min_samples_split = min_samples_split
+        self.min_samples_leaf = min_samples_leaf
+        self.min_impurity_decrease = min_impurity_decrease
+        self.max_leaf_nodes = max_leaf_nodes
+        self.ccp_alpha = ccp_alpha
+        self.growth = growth
+        self.n_jobs = n_jobs
+
+    def params(self):
+        """Return the growth settings named in TREE_PARAMS as a dict."""
+
+        params = {name: getattr(self, name) for name in TREE_PARAMS}
+        params['criterion'] = get_criterion(self.criterion).name
+        return params
+
+    @property
+    def root(self):
+        """Root DecisionNode, rebuilt from the flat tree when first needed.
+        Trees loaded by load() only hold flat arrays until then.
+        """
+
+        if self._root is None and self.flat is not None:
+            self._root = self.flat.to_node()
+        return self._root
+
+    @root.setter
+    def root(self, node):
+        """Replace the tree with a tree of DecisionNodes.
+        The flat arrays and node statistics of an earlier fit no longer
+        describe it, so they are dropped and classify() walks the nodes.
+        """
+
+        self._root = node
+        self.flat = None
+        self.node_stats = None
+
+    def save(self, data_file_path):
+        """Write the fitted tree to a compact binary file.
+        Args:
+            data_file_path (str): path to model file.
+        """
+
+        attributes = self.params()
+        attributes['model'] = 'DecisionTree'
+        save_arrays(data_file_path, flat_tree_arrays([self.flat]),
+                    attributes=attributes)
+
+    @classmethod
+    def load(cls, data_file_path, memory_map=True):
+        """Read a tree written by save().
+        Args:
+            data_file_path (str): path to model file.
+            memory_map (bool): map the node arrays instead of reading them.
+        Returns:
+            DecisionTree.
+        """
+
+        arrays, attributes = load_arrays(data_file_path, memory_map)
+        if attributes.pop('model', None) != 'DecisionTree':
+            raise ValueError('{} does not hold a DecisionTree'.format(data_file_path))
+        tree = cls(**attributes)
+        tree.flat = flat_trees_from_arrays(arrays)[0]
+        return tree
+
+    def fit(self, features, classes):
+        """Build the tree from root using __build_tree__().
+        Args:
+            features (m x n): m examples with n features, dense or a
+                binary CSRMatrix.
+            classes (m x 1): Array of Classes.
+        """
+
+        features = as_examples(features)
+        classes = np.asarray(classes)
+        if isinstance(features, CSRMatrix):
+            self.fit_sparse(features, classes)
+        elif self.max_bins is None:
+            self._root = self.__build_tree__(features, classes)
+        else:
+            binned, bin_edges = bin_features(features, self.max_bins)
+            self.fit_binned(binned, bin_edges, classes)
+
+    def fit_binned(self, binned, bin_edges, classes, rows=None, columns=None):
+        """Build the tree from examples already quantized by bin_features().
+        Lets several trees share one binned copy of the data.
+        Args:
+            binned (m x n): binned examples.
+            bin_edges (list): bin edges of every column.
+            classes (m x 1): Array of Classes.
+            rows (k x 1): rows to train on, repeats allowed. Default is all.
+            columns (c x 1): columns to train on. Default is all. The tree
+                then classifies examples holding only these columns.
+        """
+
+        with search_pool(self.n_jobs) as (pool, num_workers):
+            splitter = HistogramSplitter(binned, bin_edges, np.asarray(classes),
+                                         rows, columns, self.criterion,
+                                         self.min_samples_leaf, pool,
+                                         num_workers)
+            self._root = self.__grow_tree__(splitter)
+
+    def fit_blocks(self, blocks, sample_rows=100000):
+        """Build the tree from examples streamed from disk.
+        Bin edges come from a sample drawn in one pass; the tree then
+        grows one level per further pass, holding only per-bin class
+        histograms of the open nodes, never the whole dataset.
+        max_leaf_nodes, ccp_alpha and growth do not apply.
+        Args:
+            blocks (func): returns a fresh iterator of (features, classes)
+                blocks each time it is called, e.g.
+                lambda: iter_csv(path) or lambda: iter_dataset(path).
+            sample_rows (int): examples sampled to choose bin edges.
+        """
+
+        sample, class_values = sample_blocks(blocks(), sample_rows)
+        bin_edges = compute_bin_edges(sample, self.max_bins or 255)
+        grower = StreamingTreeGrower(bin_edges, self.depth_limit, class_values,
+                                     criterion=self.criterion,
+                                     min_samples_split=self.min_samples_split,
+                                     min_samples_leaf=self.min_samples_leaf,
+                                     min_impurity_decrease=self.min_impurity_decrease)
+        grow_from_blocks([grower], blocks, bin_edges, class_values)
+        self.flat = grower.flat()
+        self._root = None
+
+    def fit_sparse(self, matrix, classes, rows=None, columns=None):
+        """Build the tree on a binary CSRMatrix without densifying it.
+        Args:
+            matrix (CSRMatrix): binary examples.
+            classes (m x 1): Array of Classes.
+            rows (k x 1): rows to train on, repeats allowed. Default is all.
+            columns (c x 1): columns to train on. Default is all. The tree
+                then classifies examples holding only these columns.
+        """
+
+        splitter = SparseSplitter(matrix, np.asarray(classes), rows, columns,
+                                  self.criterion, self.min_samples_leaf)
+        self._root = self.__grow_tree__(splitter)
+
+    def __build_tree__(self, features, classes, depth=0):
+        """Build tree that automatically finds the decision functions.
+        Every feature column is sorted once up front; the nodes below then
+        only filter those sorted orders, so no node ever sorts again.
+        Args:
+            features (m x n): m examples with n features.
+            classes (m x 1): Array of Classes.
+            depth (int): depth to build tree to.
+        Returns:
+            Root node of decision tree.
+        """
+
+        with search_pool(self.n_jobs) as (pool, num_workers):
+            splitter = ExactSplitter(features, classes, self.criterion,
+                                     self.min_samples_leaf, pool, num_workers)
+            return self.__grow_tree__(splitter, depth)
+
+    def __grow_tree__(self, splitter, depth=0):
+        """Grow a tree from the splitter's root and keep its flat form.
+        Args:
+            splitter (ExactSplitter, HistogramSplitter or SparseSplitter):
+                split search.
+            depth (int): depth of the root.
+        Returns:
+            Root node of decision tree.
+        """
+
+        stats = _NO_STATS if self.stats is None else self.stats
+        root_node = splitter.root()
+        self.__num_samples = splitter.criterion.node_size(splitter.node_counts(root_node))
+        try:
+            root = self.__grow_nodes__(splitter, root_node, depth, stats)
+        finally:
+            if self.stats is not None:
+                self.stats.end_tree()
+
+        self.flat = FlatTree.from_node(root)
+        self.class_values = splitter.class_values
+        self.node_stats = np.array([node.stats for node in preorder_nodes(root)])
+        if self.ccp_alpha > 0:
+            self.prune(self.ccp_alpha)
+            return self.root
+        return root
+
+    def __open_node__(self, splitter, node, depth, stats):
+        """Make a leaf for one node and search for its split.
+        Args:
+            splitter (ExactSplitter, HistogramSplitter or SparseSplitter):
+                split search.
+            node: the splitter's description of the node's examples.
+            depth (int): depth of this node.
+            stats (TrainingStats): receives the record of a node that
+                stays a leaf.
+        Returns:
+            Tuple (leaf DecisionNode, split or None when the node stays a
+                leaf, measure() of the split search).
+        """
+
+        criterion = splitter.criterion
+        node_counts = splitter.node_counts(node)
+        leaf = DecisionNode(None, None, None,
+                            criterion.leaf_value(node_counts, splitter.class_values))
+        leaf.stats = node_counts
+        size = criterion.node_size(node_counts)
+
+        if (size < max(self.min_samples_split, 2) or criterion.is_pure(node_counts)
+                or depth >= self.depth_limit):
+            stats.record(depth, size, 0, False)
+            return leaf, None, None
+
+        split, searched = stats.measure(splitter.find_split, node)
+        bestfeat, _, bestgini, _ = split
+
+        if (bestfeat is None or bestgini <= 0.0 or
+                bestgini * size / self.__num_samples < self.min_impurity_decrease):
+            stats.record(depth, size, splitter.num_candidates(node), False,
+                         searched)
+            return leaf, None, None
+        return leaf, split, searched
+
+    def __split_nodes__(self, splitter, batch, stats):
+        """Turn opened leaves into internal nodes.
+        Args:
+            splitter (ExactSplitter, HistogramSplitter or SparseSplitter):
+                split search.
+            batch (list(tuple)): (leaf, node, depth, split, searched) of
+                nodes of one depth, from __open_node__().
+            stats (TrainingStats): receives a record of every node; the
+                partition cost is shared evenly between the batch.
+        Returns:
+            List of (left node, right node) of the splitter.
+        """
+
+        nodes = [node for _, node, _, _, _ in batch]
+        splits = [split for _, _, _, split, _ in batch]
+        keep_stats = batch[0][2] + 1 < self.depth_limit
+        children, partitioned = stats.measure(
+            splitter.partition_level, nodes, splits, keep_stats)
+
+        if partitioned is not None:
+            partitioned = (partitioned[0] / len(batch), partitioned[1] // len(batch))
+        for leaf, node, depth, split, searched in batch:
+            stats.record(depth, splitter.criterion.node_size(leaf.stats),
+                         splitter.num_candidates(node), True, searched,
+                         partitioned)
+            leaf.decision_function = Split(split[0], split[1])
+            leaf.class_label = None
+        return children
+
+    def __grow_nodes__(self, splitter, node, depth, stats=_NO_STATS):
+        """Grow a tree from a work queue of open nodes, without recursion.
+        Every node whose split search found a split waits in the queue, and
+        the growth policy picks which are split next: 'depth' the newest,
+        left before right; 'breadth' every node of the shallowest level,
+        partitioned together; 'best' the one with the largest weighted
+        impurity decrease. Nodes still queued once the tree has
+        max_leaf_nodes leaves stay leaves.
+        Args:
+            splitter (ExactSplitter, HistogramSplitter or SparseSplitter):
+                split search.
+            node: the splitter's description of the root's examples.
+            depth (int): depth of the root.
+            stats (TrainingStats): receives a record of every node.
+        Returns:
+            Root node of decision tree.
+        """
+
+        criterion = splitter.criterion
+        growth = self.growth
+        if growth is None:
+            growth = 'depth' if self.max_leaf_nodes is None else 'best'
+        max_leaf_nodes = self.max_leaf_nodes
+        if max_leaf_nodes is None:
+            max_leaf_nodes = float('inf')
+        queue, order = [], itertools.count()
+
+        def enqueue(opened):
+            if growth == 'depth':
+                queue.extend(reversed(opened))
+            elif growth == 'breadth':
+                queue.extend(opened)
+            else:
+                for entry in opened:
+                    decrease = entry[3][2] * criterion.node_size(entry[0].stats)
+                    heapq.heappush(queue, (-decrease, next(order), entry))
+
+        def open_node(node, depth, opened):
+            leaf, split, searched = self.__open_node__(splitter, node, depth, stats)
+            if split is not None:
+                opened.append((leaf, node, depth, split, searched))
+            return leaf
+
+        opened = []
+        root = open_node(node, depth, opened)
+        enqueue(opened)
+        num_leaves = 1
+        while queue and num_leaves < max_leaf_nodes:
+            if growth == 'depth':
+                batch = [queue.pop()]
+            elif growth == 'breadth':
+                size = int(min(len(queue), max_leaf_nodes - num_leaves))
+                batch, queue[:size] = queue[:size], []
+            else:
+                batch = [heapq.heappop(queue)[2]]
+
+            opened = []
+            for (leaf, _, depth, _, _), (left, right) in zip(
+                    batch, self.__split_nodes__(splitter, batch, stats)):
+                leaf.left = open_node(left, depth + 1, opened)
+                leaf.right = open_node(right, depth + 1, opened)
+            enqueue(opened)
+            num_leaves += len(batch)
+
+        if growth == 'best':
+            queue = [entry for _, _, entry in queue]
+        for leaf, node, depth, _, searched in queue:
+            stats.record(depth, criterion.node_size(leaf.stats),
+                         splitter.num_candidates(node), False, searched)
+        return root
+
+    def prune(self, ccp_alpha, features=None, classes=None):
+        """Apply minimal cost-complexity pruning to the fitted tree.
+        See prune_cost_complexity().
+        Args:
+            ccp_alpha (float): complexity cost of each leaf.
+            features (m x n): examples to measure node impurity on. Default
+                is the training examples, as counted while fitting.
+            classes (m x 1): Array of Classes of features.
+        """
+
+        criterion = get_criterion(self.criterion)
+        node_stats, class_values = self.node_stats, self.class_values
+        if features is not None:
+            class_values, stats, num_stats = criterion.statistics(classes)
+            leaves = self.flat.apply(features)
+            node_stats = subtree_statistics(
+                self.flat, sum_statistics(stats, leaves, len(self.flat.feature),
+                                          num_stats))
+        if node_stats is None:
+            raise ValueError('Pruning a loaded tree needs features and classes')
+
+        self.flat, self.node_stats = prune_cost_complexity(
+            self.flat, node_stats, ccp_alpha, criterion, class_values)
+        self.class_values = class_values
+        self._root = None
+
+    def classify(self, features):
+        """Use the fitted tree to classify a list of example features.
+        Args:
+            features (m x n): m examples with n features.
+        Return:
+            A list of class labels.
+        """
+
+        if self.flat is not None:
+            return self.predict_batch(features).tolist()
+
+        predicted_labels = [self.root.decide(features[i]) for i in range(features.shape[0])]
+        return predicted_labels
+
+    def predict_batch(self, features, block_size=65536):
+        """Classify examples in vectorized blocks with the flat tree.
+        Args:
+            features (m x n): m examples with n features.
+            block_size (int): examples sent down the tree together.
+        Returns:
+            Array of m class labels.
+        """
+
+        return self.flat.predict_batch(features, block_size)
+
+
+def seed_sequence(random_state=None):
+    """Turn a random_state argument into a np.random.SeedSequence.
+    Args:
+        random_state (None, int, SeedSequence or Generator): None draws the
+            seed from the global np.random state, so np.random.seed() still
+            applies; an int or SeedSequence fixes the stream; a Generator
+            is advanced to draw one.
+    Returns:
+        np.random.SeedSequence.
+    """
+
+    if random_state is None:
+        # dtype=np.int64: the default int is int32 on Windows under numpy 1.x,
+        # where 2 ** 32 is out of bounds.
+        seed = np.random.randint(2 ** 32, dtype=np.int64)
+        return np.random.SeedSequence(seed)
+    if isinstance(random_state, np.random.SeedSequence):
+        return random_state
+    if isinstance(random_state, np.random.Generator):
+        return np.random.SeedSequence(random_state.integers(2 ** 32, size=4))
+    return np.random.SeedSequence(random_state)
+
+
+_forest_data = {}
+
+
+def portable_array(array):
+    """Describe a file-backed np.memmap by its file instead of its data.
+    Passing the description to another process lets it map the same
+    file, sharing the page cache, rather than unpickling a full copy.
+    Other arrays are returned unchanged.
+    """
+
+    if isinstance(array, np.memmap) and isinstance(array.base, mmap.mmap):
+        order = 'F' if array.flags.f_contiguous and array.ndim > 1 else 'C'
+        return ('memmap', array.filename, array.dtype.str, array.shape, order,
+                array.offset)
+    return array
+
+
+def restore_array(array):
+    """Map an array described by portable_array() again."""
+
+    if isinstance(array, tuple) and array and array[0] == 'memmap':
+        _, filename, dtype, shape, order, offset = array
+        return np.memmap(filename, dtype=dtype, mode='r', offset=offset,
+                         shape=shape, order=order)
+    return array
+
+
+def _share_forest_data(features, bin_edges, classes):
+    """Process pool initializer: keep the training data for every task.
+    The data reaches each worker once, instead of once per tree, and
+    memory-mapped datasets are mapped again rather than copied.
+    """
+
+    _forest_data['features'] = restore_array(features)
+    _forest_data['bin_edges'] = bin_edges
+    _forest_data['classes'] = restore_array(classes)
+
+
+def _fit_shared_forest_tree(settings, seed):
+    """Process pool task: train one tree on the data shared with this process.
+    See _fit_forest_tree().
+    """
+
+    return _fit_forest_tree(settings, seed, _forest_data['features'],
+                            _forest_data['bin_edges'], _forest_data['classes'])
+
+
+def _fit_forest_tree(settings, seed, features, bin_edges, classes):
+    """Train one tree of a forest.
+    Args:
+        settings (tuple): (tree_params, num_subsamples, num_features,
+            trace_memory) of the forest; tree_params are the DecisionTree
+            arguments and trace_memory is None when the forest keeps no
+            TrainingStats.
+        seed (np.random.SeedSequence): the tree's own random stream.
+        features (m x n): examples, binned when bin_edges is set, or a
+            CSRMatrix.
+        bin_edges (list): bin edges of the binned examples, or None.
+        classes (m x 1): Array of Classes.
+    Returns:
+        Tuple (fitted DecisionTree, attribute indices it was trained on,
+            packed bitmap of the examples it was trained on).
+    """
+
+    tree_params, num_subsamples, num_features, trace_memory = settings
+    rng = np.random.default_rng(seed)
+    num_samples, num_feat = features.shape
+    subfeatindex = rng.choice(num_samples, num_subsamples, replace=True)
+    subfeatsubidx = rng.choice(num_feat, num_features, replace=False)
+
+    stats = None if trace_memory is None else TrainingStats(trace_memory=trace_memory)
+    tree = DecisionTree(stats=stats, **tree_params)
+    if isinstance(features, CSRMatrix):
+        tree.fit_sparse(features, classes, subfeatindex, subfeatsubidx)
+    elif tree.max_bins is None:
+        tree.fit(features[np.ix_(subfeatindex, subfeatsubidx)],
+                 classes[subfeatindex])
+    else:
+        tree.fit_binned(features, bin_edges, classes, subfeatindex,
+                        subfeatsubidx)
+
+    # The flat arrays are enough; the node graph is rebuilt lazily, and
+    # pickling it back from a worker would recurse once per tree level.
+    tree._root = None
+    inbag = np.zeros(num_samples, dtype=bool)
+    inbag[subfeatindex] = True
+    return tree, subfeatsubidx, np.packbits(inbag)
+
+
+class RandomForest:
+    """Random forest classification."""
+
+    def __init__(self, num_trees, depth_limit, example_subsample_rate,
+                 attr_subsample_rate, max_bins=None, n_jobs=1,
+                 random_state=None, oob_score=False, criterion='gini',
+                 stats=None, min_samples_split=2, min_samples_leaf=1,
+                 min_impurity_decrease=0.0, max_leaf_nodes=None, ccp_alpha=0.0,
+                 growth=None, tree_n_jobs=1):
+        """Create a random forest.
+         Args:
+             num_trees (int): fixed number of trees.
              depth_limit (int): max depth limit of tree.
              example_subsample_rate (float): percentage of example samples.
              attr_subsample_rate (float): percentage of attribute samples.
+             max_bins (int): When set, bin the data once and train every
+                 tree on histograms of that shared binned copy.
+             n_jobs (int): processes training trees in parallel; -1 uses
+                 every CPU. Default is 1, training in this process.
+             random_state (None, int, SeedSequence or Generator): seeds the
+                 forest; each tree gets an independent child stream of it,
+                 so a fixed seed gives identical forests for any n_jobs.
+             oob_score (bool): score every example with the trees that did
+                 not train on it while fitting, setting oob_accuracy and
+                 oob_confusion, the confusion_counts() of those votes.
+             criterion (str): 'gini' or 'entropy', the split criterion of
+                 every tree.
+             stats (TrainingStats): when set, every tree's node records
+                 are merged into it by fit(), in tree order.
+             min_samples_split, min_samples_leaf, min_impurity_decrease,
+             max_leaf_nodes, ccp_alpha, growth: growth limits and order of
+                 every tree; see DecisionTree.
+             tree_n_jobs (int): threads each tree searches its splits
+                 with, for forests of few trees on many features; see
+                 DecisionTree n_jobs. Default is 1.
         """
 
+        if not isinstance(get_criterion(criterion), ClassCriterion):
+            raise ValueError('A RandomForest votes on classes; use gini or entropy')
+
         self.trees = []
         self.num_trees = num_trees
         self.depth_limit = depth_limit
         self.example_subsample_rate = example_subsample_rate
         self.attr_subsample_rate = attr_subsample_rate
+        self.max_bins = max_bins
+        self.n_jobs = n_jobs
+        self.random_state = random_state
+        self.oob_score = oob_score
+        self.criterion = criterion
+        self.stats = stats
+        self.min_samples_split = min_samples_split
+        self.min_samples_leaf = min_samples_leaf
+        self.min_impurity_decrease = min_impurity_decrease
+        self.max_leaf_nodes = max_leaf_nodes
+        self.ccp_alpha = ccp_alpha
+        self.growth = growth
+        self.tree_n_jobs = tree_n_jobs
         self.feature_list = []
+        self.inbag_list = []
+        self.class_values = np.array([0, 1])
+        self.oob_accuracy = None
+        self.oob_confusion = None
+
+    def tree_params(self):
+        """Return the DecisionTree arguments named in TREE_PARAMS as a dict."""
+
+        params = {name: getattr(self, name) for name in TREE_PARAMS}
+        params['criterion'] = get_criterion(self.criterion).name
+        return params
 
     def fit(self, features, classes):
         """Build a random forest of decision trees using Bootstrap Aggregation.
-            features (m x n): m examples with n features.
+        Every tree draws its examples and attributes from its own random
+        stream, so trees can be trained in any order or process.
+            features (m x n): m examples with n features, dense or a binary
+                CSRMatrix (trained sparse; max_bins does not apply).
             classes (m x 1): Array of Classes.
         """
-        num_samples = len(classes)
+
+        features = as_examples(features)
+        classes = np.asarray(classes).astype(int)
+        num_samples, num_feat = features.shape
         num_subsamples = int(self.example_subsample_rate * num_samples)
-        num_feat = len(features[0])
         num_features = int(self.attr_subsample_rate * num_feat)
-        for i in range(self.num_trees):
-            subfeatindex= np.random.choice(num_samples, num_subsamples, replace = True).reshape(-1, 1)
-            subsamp = np.squeeze(features[subfeatindex])
-            subfeatsubidx = np.random.choice(num_feat, num_features, replace = False)
+
+        raw_features, bin_edges = features, None
+        if self.max_bins is not None and not isinstance(features, CSRMatrix):
+            features, bin_edges = bin_features(features, self.max_bins)
+
+        trace_memory = None if self.stats is None else self.stats.trace_memory
+        settings = (dict(self.tree_params(), n_jobs=self.tree_n_jobs),
+                    num_subsamples, num_features, trace_memory)
+        seeds = seed_sequence(self.random_state).spawn(self.num_trees)
+        num_workers = os.cpu_count() if self.n_jobs == -1 else self.n_jobs
+
+        self.trees = []
+        self.feature_list = []
+        self.inbag_list = []
+        self.class_values = np.unique(classes)
+        oob_votes = np.zeros((num_samples, len(self.class_values)), dtype=np.intp)
+        oob_counts = np.zeros(num_samples, dtype=np.intp)
+
+        if num_workers is None or num_workers <= 1:
+            for seed in seeds:
+                self.__add_tree__(_fit_forest_tree(settings, seed, features,
+                                                   bin_edges, classes),
+                                  raw_features, oob_votes, oob_counts)
+        else:
+            with ProcessPoolExecutor(num_workers, initializer=_share_forest_data,
+                                     initargs=(portable_array(features), bin_edges,
+                                               portable_array(classes))) as pool:
+                for fitted in pool.map(_fit_shared_forest_tree,
+                                       [settings] * self.num_trees, seeds):
+                    self.__add_tree__(fitted, raw_features, oob_votes,
+                                      oob_counts)
+
+        if self.oob_score:
+            scored = oob_counts > 0
+            oob_output = self.class_values[np.argmax(oob_votes[scored], axis=1)]
+            self.oob_accuracy = accuracy(oob_output, classes[scored])
+            self.oob_confusion, _ = confusion_counts(
+                oob_output, classes[scored], self.class_values)
+
+    def save(self, data_file_path):
+        """Write the fitted forest to a compact binary file.
+        All trees' node arrays and attribute lists are stored as a few
+        concatenated arrays with offsets.
+        Args:
+            data_file_path (str): path to model file.
+        """
+
+        arrays = flat_tree_arrays([tree.flat for tree in self.trees])
+        arrays['feature_list'] = np.concatenate(
+            [np.asarray(columns, dtype=np.int64) for columns in self.feature_list])
+        arrays['class_values'] = self.class_values
+        random_state = self.random_state
+        if not isinstance(random_state, int):
+            random_state = None
+        attributes = self.tree_params()
+        attributes.update({
+            'model': 'RandomForest',
+            'num_trees': self.num_trees,
+            'example_subsample_rate': self.example_subsample_rate,
+            'attr_subsample_rate': self.attr_subsample_rate,
+            'random_state': random_state})
+        save_arrays(data_file_path, arrays, attributes=attributes)
+
+    @classmethod
+    def load(cls, data_file_path, memory_map=True):
+        """Read a forest written by save().
+        The trees are views of the mapped arrays; no per-node Python
+        objects are built until a tree's root is asked for.
+        Args:
+            data_file_path (str): path to model file.
+            memory_map (bool): map the arrays instead of reading them.
+        Returns:
+            RandomForest.
+        """
+
+        arrays, attributes = load_arrays(data_file_path, memory_map)
+        if attributes.pop('model', None) != 'RandomForest':
+            raise ValueError('{} does not hold a RandomForest'.format(data_file_path))
+        forest = cls(**attributes)
+        if 'class_values' in arrays:
+            forest.class_values = arrays['class_values']
+        flat_trees = flat_trees_from_arrays(arrays)
+        num_features = len(arrays['feature_list']) // len(flat_trees)
+        for i, flat in enumerate(flat_trees):
+            tree = DecisionTree(**forest.tree_params())
+            tree.flat = flat
+            forest.trees.append(tree)
+            forest.feature_list.append(
+                arrays['feature_list'][i * num_features:(i + 1) * num_features])
+        return forest
+
+    def fit_blocks(self, blocks, sample_rows=100000):
+        """Build the forest from examples streamed from disk.
+        All trees grow together, one level per pass over the blocks.
+        Each tree counts every example Poisson(example_subsample_rate)
+        times, drawn from its own random stream, in place of a bootstrap
+        sample that would need the whole dataset in memory.
+        max_leaf_nodes, ccp_alpha and growth do not apply.
+        Args:
+            blocks (func): returns a fresh iterator of (features, classes)
+                blocks each time it is called.
+            sample_rows (int): examples sampled to choose bin edges.
+        """
+
+        sample, self.class_values = sample_blocks(blocks(), sample_rows)
+        bin_edges = compute_bin_edges(sample, self.max_bins or 255)
+        num_feat = len(bin_edges)
+        num_features = int(self.attr_subsample_rate * num_feat)
+        seeds = seed_sequence(self.random_state).spawn(self.num_trees)
+
+        growers = []
+        self.feature_list = []
+        for seed in seeds:
+            column_seed, count_seed = seed.spawn(2)
+            subfeatsubidx = np.random.default_rng(column_seed).choice(
+                num_feat, num_features, replace=False)
             self.feature_list.append(subfeatsubidx)
-            subsampfeats = subsamp[:, subfeatsubidx]
-            subsampfeats_classes = classes[subfeatindex].astype(int)
-            tree = DecisionTree(self.depth_limit)
-            tree.fit(subsampfeats, np.squeeze(subsampfeats_classes))
+            growers.append(StreamingTreeGrower(
+                bin_edges, self.depth_limit, self.class_values, subfeatsubidx,
+                self.example_subsample_rate, count_seed, self.criterion,
+                self.min_samples_split, self.min_samples_leaf,
+                self.min_impurity_decrease))
+        grow_from_blocks(growers, blocks, bin_edges, self.class_values)
+
+        self.trees = []
+        self.inbag_list = []
+        for grower in growers:
+            tree = DecisionTree(**self.tree_params())
+            tree.flat = grower.flat()
             self.trees.append(tree)
 
+    def __add_tree__(self, fitted, features, oob_votes, oob_counts):
+        """Keep a fitted tree and add its out-of-bag votes.
+        Args:
+            fitted (tuple): result of _fit_forest_tree().
+            features (m x n): the raw training examples.
+            oob_votes (m x k): running class votes of out-of-bag trees.
+            oob_counts (m x 1): running number of out-of-bag trees.
+        """
+
+        tree, subfeatsubidx, inbag = fitted
+        if tree.stats is not None:
+            self.stats.merge(tree.stats)
+            tree.stats = None
+        self.trees.append(tree)
+        self.feature_list.append(subfeatsubidx)
+        self.inbag_list.append(inbag)
+        if not self.oob_score:
+            return
+
+        inbag = np.unpackbits(inbag, count=len(oob_counts)).astype(bool)
+        out_of_bag = np.flatnonzero(~inbag)
+        flat = self.__voting_tree__(tree, subfeatsubidx)
+        oob_votes[out_of_bag, flat.predict_batch(features[out_of_bag])] += 1
+        oob_counts[out_of_bag] += 1
+
+    def __voting_tree__(self, tree, columns):
+        """Return a tree's flat form reading the full examples and leaving
+        the position of its class in class_values at every leaf.
+        """
+
+        flat = tree.flat.remap_features(columns)
+        flat.value = np.searchsorted(self.class_values, flat.value)
+        return flat
 
     def classify(self, features):
         """Classify a list of features based on the trained random forest.
+        Each example gets the class most trees vote for; ties go to the
+        smallest class.
         Args:
             features (m x n): m examples with n features.
         """
-  
-        class_label = []
-        for i in range(self.num_trees):
-            tree = self.trees[i]
-            class_labels = np.array(tree.classify(features[:, self.feature_list[i]])).reshape(-1, 1)
-            class_label.append(class_labels)
-            
-        class_label = np.column_stack(class_label)
-        majority_vote= np.mean(class_label, axis=1)
-        featurelist = (majority_vote > 0.5).reshape(-1, 1)
+
+        votes = self.vote_counts(features)
+        featurelist = self.class_values[np.argmax(votes, axis=1)].reshape(-1, 1)
 
         return featurelist
 
+    def vote_counts(self, features, block_size=65536):
+        """Count the trees voting for each class on every example.
+        Each tree reads the full examples through its remapped flat form,
+        and votes are added into one running count per example and class.
+        Blocks of examples are shared out between n_jobs threads.
+        Args:
+            features (m x n): m examples with n features.
+            block_size (int): examples classified together.
+        Returns:
+            (m x k) array of vote counts, column j counting class_values[j].
+        """
+
+        features = as_examples(features)
+        flat_trees = [self.__voting_tree__(tree, columns) for tree, columns
+                      in zip(self.trees[:self.num_trees], self.feature_list)]
+        votes = np.zeros((features.shape[0], len(self.class_values)),
+                         dtype=np.intp)
+
+        def count_block(begin):
+            block = features[begin:begin + block_size]
+            block_votes = votes[begin:begin + block_size]
+            rows = np.arange(block.shape[0])
+            for flat in flat_trees:
+                block_votes[rows, flat.predict_batch(block, block_size)] += 1
+
+        blocks = range(0, features.shape[0], block_size)
+        num_workers = os.cpu_count() if self.n_jobs == -1 else self.n_jobs
+        if num_workers is None or num_workers <= 1 or len(blocks) <= 1:
+            for begin in blocks:
+                count_block(begin)
+        else:
+            with ThreadPoolExecutor(num_workers) as pool:
+                list(pool.map(count_block, blocks))
+
+        return votes
+
+
+
+def _literal(value):
+    """Source text of a label or threshold that reads back exactly."""
+
+    return repr(np.asarray(value).item())
+
+
+def _tree_row_source(flat, name):
+    """Source of a function walking one example through nested ifs."""
+
+    lines = ['def {}(features):'.format(name)]
+    stack = [(0, 1)]
+    while stack:
+        node, depth = stack.pop()
+        indent = '    ' * depth
+        if isinstance(node, str):
+            lines.append(indent + node)
+            continue
+        if flat.feature[node] < 0:
+            lines.append('{}return {}'.format(indent, _literal(flat.value[node])))
+            continue
+        if depth > 90:
+            raise ValueError('Tree is too deep for nested if statements')
+        lines.append('{}if features[{}] <= {}:'.format(
+            indent, flat.feature[node], _literal(flat.threshold[node])))
+        stack.append((flat.right[node], depth + 1))
+        stack.append(('else:', depth))
+        stack.append((flat.left[node], depth + 1))
+    return '\n'.join(lines) + '\n'
+
+
+def _tree_batch_source(flat, name):
+    """Source of a function classifying all examples with np.where.
+    Nodes are evaluated from the last to the root; every internal node
+    picks between its children's results, so there is no nesting.
+    """
+
+    def result(node):
+        if flat.feature[node] < 0:
+            return _literal(flat.value[node])
+        return 'v{}'.format(node)
+
+    lines = ['def {}(features):'.format(name),
+             '    features = np.asarray(features)']
+    if flat.feature[0] < 0:
+        lines.append('    return np.full(len(features), {})'.format(
+            _literal(flat.value[0])))
+        return '\n'.join(lines) + '\n'
+
+    for node in range(len(flat.feature) - 1, -1, -1):
+        if flat.feature[node] < 0:
+            continue
+        left, right = flat.left[node], flat.right[node]
+        lines.append('    v{} = np.where(features[:, {}] <= {}, {}, {})'.format(
+            node, flat.feature[node], _literal(flat.threshold[node]),
+            result(left), result(right)))
+        used = [result(child) for child in (left, right)
+                if flat.feature[child] >= 0]
+        if used:
+            lines.append('    del {}'.format(', '.join(used)))
+    lines.append('    return np.asarray(v0)')
+    return '\n'.join(lines) + '\n'
+
+
+def export_python(model, data_file_path=None):
+    """Generate Python source that classifies like a fitted model.
+    The module defines classify_row(features), which tests one example
+    with nested if statements on constant feature indices and
+    thresholds, and classify_batch(features), the same tree evaluated on
+    an (m x n) array with np.where. For a RandomForest both return the
+    majority vote, ties going to the smallest class, the batch version
+    as a flat array.
+    Args:
+        model (DecisionTree or RandomForest): fitted model.
+        data_file_path (str): when set, also write the source there.
+    Returns:
+        The generated source.
+    """
+
+    parts = ['"""Generated by export_python(); do not edit."""\n'
+             'import numpy as np\n']
+    if isinstance(model, RandomForest):
+        flat_trees = [tree.flat.remap_features(columns) for tree, columns
+                      in zip(model.trees[:model.num_trees], model.feature_list)]
+        for i, flat in enumerate(flat_trees):
+            parts.append(_tree_row_source(flat, '_tree_{}_row'.format(i)))
+            parts.append(_tree_batch_source(flat, '_tree_{}_batch'.format(i)))
+        row_trees = ', '.join('_tree_{}_row'.format(i) for i in range(len(flat_trees)))
+        batch_trees = ', '.join('_tree_{}_batch'.format(i) for i in range(len(flat_trees)))
+        class_values = ', '.join(_literal(value) for value in model.class_values)
+        parts.append('_ROW_TREES = ({},)\n_BATCH_TREES = ({},)\n'
+                     '_CLASSES = ({},)\n'.format(row_trees, batch_trees,
+                                                 class_values))
+        parts.append('def classify_row(features):\n'
+                     '    votes = [0] * len(_CLASSES)\n'
+                     '    for tree in _ROW_TREES:\n'
+                     '        votes[_CLASSES.index(tree(features))] += 1\n'
+                     '    return _CLASSES[votes.index(max(votes))]\n')
+        parts.append('def classify_batch(features):\n'
+                     '    classes = np.array(_CLASSES)\n'
+                     '    votes = np.zeros((len(features), len(classes)), dtype=np.intp)\n'
+                     '    for tree in _BATCH_TREES:\n'
+                     '        votes += tree(features)[:, None] == classes\n'
+                     '    return classes[np.argmax(votes, axis=1)]\n')
+    else:
+        parts.append(_tree_row_source(model.flat, 'classify_row'))
+        parts.append(_tree_batch_source(model.flat, 'classify_batch'))
+
+    source = '\n\n'.join(parts)
+    if data_file_path is not None:
+        with open(data_file_path, 'w') as handle:
+            handle.write(source)
+    return source
 
 
 class Vectorization: